@@ -0,0 +1,10 @@
+# bench/__init__.py
+"""
+Local benchmark suite for the queue.
+
+Run from the repository root so the project's `queue` package is importable:
+
+    python -m bench                 # full run, writes bench/results/<stamp>.json
+    python -m bench --quick         # smaller sizes, for a fast sanity check
+    python -m bench --baseline bench/baseline.json
+"""
@@ -0,0 +1,5 @@
+# bench/__main__.py
+from .harness import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+# bench/harness.py
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from queue import config
+from queue.config import BASE_DIR
+from queue.db import init_db, fetch_next_pending_job, JOB_COLUMNS
+from queue.job import Job, create_job, JOB_COMPLETED
+from queue.manager import QueueManager
+from queue.utils import logger
+
+RESULTS_DIR = os.path.join(BASE_DIR, "bench", "results")
+BASELINE_FILE = os.path.join(BASE_DIR, "bench", "baseline.json")
+
+# kind -> (python handler, payload)
+JOB_KINDS = {
+    "noop": ("bench.jobs.noop", None),
+    "cpu": ("bench.jobs.cpu", {"n": 20000}),
+    "sleep": ("bench.jobs.sleep", {"ms": 5}),
+    "bulk": ("bench.jobs.bulk", None),    # no-op with a run_batch form
+}
+
+# "db size" is the number of completed rows already sitting in the jobs
+# table; they are never deleted, so this is how the table grows in practice
+PROFILES = {
+    "full": {
+        "enqueue_jobs": 5000,
+        "claim_sizes": [0, 10000, 100000],
+        "claims": 500,
+        "e2e_jobs": 2000,
+        "e2e_workers": [1, 2, 4, 8],
+        "e2e_sizes": [0, 100000],
+        "startup_runs": 15,
+        "shard_counts": [1, 2, 4, 8],
+        "producers": 8,
+        "producer_jobs": 1000,
+        "daemon_jobs": 20000,
+        "job_rows": 20000,
+    },
+    "quick": {
+        "enqueue_jobs": 1000,
+        "claim_sizes": [0, 10000],
+        "claims": 200,
+        "e2e_jobs": 300,
+        "e2e_workers": [1, 2],
+        "e2e_sizes": [0, 10000],
+        "startup_runs": 5,
+        "shard_counts": [1, 4],
+        "producers": 4,
+        "producer_jobs": 200,
+        "daemon_jobs": 2000,
+        "job_rows": 5000,
+    },
+}
+
+# Cold-start budgets for main.py, in ms on top of a bare `python -c pass` on
+# the same machine (interpreter start-up itself is not ours to optimize).
+STARTUP_BUDGET_MS = {
+    "help": 50,
+    "enqueue": 120,
+}
+
+
+class Results:
+    def __init__(self):
+        self.metrics: Dict[str, dict] = {}
+        self.over_budget: List[str] = []
+
+    def add(self, name: str, value: float, unit: str, better: str):
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"  {name:<44} {value:>12.2f} {unit}")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    # nearest-rank
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[k]
+
+
+def fill(db, n: int, kind: str = "noop", state: Optional[str] = None):
+    command, payload = JOB_KINDS[kind]
+    for start in range(0, n, 1000):
+        jobs = []
+        for _ in range(min(1000, n - start)):
+            job = create_job(command, payload=payload, mode="python")
+            if state:
+                job.state = state
+            jobs.append(job)
+        db.insert_jobs(jobs)
+
+
+def fresh_db(tmp: str, name: str, history: int = 0, pending: int = 0, kind: str = "noop") -> str:
+    path = os.path.join(tmp, f"{name}.db")
+    db = init_db(path)
+    fill(db, history, state=JOB_COMPLETED)
+    fill(db, pending, kind=kind)
+    return path
+
+
+# ------------------------
+# Suites
+# ------------------------
+def bench_enqueue(res: Results, tmp: str, p: dict):
+    n = p["enqueue_jobs"]
+    command, payload = JOB_KINDS["noop"]
+
+    fresh_db(tmp, "enqueue")
+    qm = QueueManager()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        qm.enqueue(command, payload=payload, use_python=True)
+    res.add("enqueue.single.jobs_per_s", n / (time.perf_counter() - t0), "jobs/s", "higher")
+
+    db = init_db(os.path.join(tmp, "enqueue_batch.db"))
+    t0 = time.perf_counter()
+    fill(db, n)
+    res.add("enqueue.batch.jobs_per_s", n / (time.perf_counter() - t0), "jobs/s", "higher")
+
+
+def bench_claim(res: Results, tmp: str, p: dict):
+    for size in p["claim_sizes"]:
+        fresh_db(tmp, f"claim_{size}", history=size, pending=p["claims"])
+        samples = []
+        for _ in range(p["claims"]):
+            t0 = time.perf_counter()
+            fetch_next_pending_job()
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        res.add(f"claim.db{size}.p50_ms", percentile(samples, 50), "ms", "lower")
+        res.add(f"claim.db{size}.p99_ms", percentile(samples, 99), "ms", "lower")
+
+
+def bench_job(res: Results, tmp: str, p: dict):
+    # the in-process part of a claim: row -> Job, then the two state
+    # transitions a successful job goes through. Job.from_row() on plain
+    # tuples is what the worker uses; sqlite3.Row -> dict -> from_dict() is
+    # the generic path. "legacy" is the old dataclass with text timestamps
+    # (bench/legacy.py), the baseline both are compared with.
+    from bench.legacy import LegacyJob, legacy_row
+
+    n = p["job_rows"]
+    conn = sqlite3.connect(fresh_db(tmp, "job", pending=n))
+    tuples = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs").fetchall()
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs").fetchall()
+    conn.close()
+    legacy_rows = [legacy_row(r) for r in rows]
+
+    def claim(make, src):
+        jobs = [make(r) for r in src]
+        for job in jobs:
+            job.mark_processing()
+            job.mark_completed()
+        return jobs
+
+    variants = (("from_row", Job.from_row, tuples),
+                ("from_dict", lambda r: Job.from_dict(dict(r)), rows),
+                ("legacy", lambda r: LegacyJob.from_dict(dict(r)), legacy_rows))
+    for name, make, src in variants:
+        claim(make, src)   # warm up
+        t0 = time.perf_counter()
+        claim(make, src)
+        res.add(f"job.{name}.us_per_job", (time.perf_counter() - t0) / n * 1e6, "us", "lower")
+
+        # bytes each Job keeps alive, and the high-water mark of one claim
+        # (the Job plus whatever is built on the way and thrown away)
+        tracemalloc.start()
+        jobs = claim(make, src)
+        retained, _ = tracemalloc.get_traced_memory()
+        del jobs
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        claim(make, src[:1])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        res.add(f"job.{name}.bytes_per_job", retained / n, "B", "lower")
+        res.add(f"job.{name}.peak_bytes_per_claim", peak - base, "B", "lower")
+
+
+def run_workers(path: str, workers: int) -> List[dict]:
+    procs = [
+        subprocess.Popen([sys.executable, "-m", "bench.worker", "--db", path],
+                         cwd=BASE_DIR, stdout=subprocess.PIPE)
+        for _ in range(workers)
+    ]
+    reports = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"bench worker exited with {proc.returncode}")
+        reports.append(json.loads(out))
+    return reports
+
+
+def bench_e2e(res: Results, tmp: str, p: dict):
+    n = p["e2e_jobs"]
+    # only the no-op kind is swept over db sizes; the others measure handler overhead
+    runs = [("noop", size) for size in p["e2e_sizes"]] + [("cpu", 0), ("sleep", 0), ("bulk", 0)]
+    for kind, size in runs:
+        for workers in p["e2e_workers"]:
+            path = fresh_db(tmp, f"e2e_{kind}_{size}_{workers}", history=size, pending=n, kind=kind)
+            reports = run_workers(path, workers)
+            processed = sum(r["processed"] for r in reports)
+            if processed != n:
+                raise RuntimeError(f"e2e {kind}: processed {processed} of {n} jobs")
+            started = [r["first"] for r in reports if r["first"] is not None]
+            span = max(r["last"] for r in reports if r["last"] is not None) - min(started)
+            rss = sum(r["maxrss_kb"] for r in reports) / len(reports) / 1024.0
+            name = f"e2e.{kind}.db{size}.w{workers}"
+            res.add(f"{name}.jobs_per_s", n / span, "jobs/s", "higher")
+            res.add(f"{name}.rss_mb", rss, "MB", "lower")
+
+
+def run_producers(args: List[str], producers: int, env: Optional[dict] = None) -> float:
+    """Run producer processes concurrently; returns the combined jobs/sec."""
+    procs = [
+        subprocess.Popen([sys.executable, "-m", "bench.producer"] + args,
+                         cwd=BASE_DIR, env=env, stdout=subprocess.PIPE)
+        for _ in range(producers)
+    ]
+    reports = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"bench producer exited with {proc.returncode}")
+        reports.append(json.loads(out))
+    total = sum(r["jobs"] for r in reports)
+    span = max(r["end"] for r in reports) - min(r["start"] for r in reports)
+    return total / span
+
+
+def bench_shards(res: Results, tmp: str, p: dict):
+    # concurrent single-row enqueues from several processes, per shard count
+    for shards in p["shard_counts"]:
+        path = os.path.join(tmp, f"shards_{shards}.db")
+        init_db(path, shards)   # create the tables up front
+        rate = run_producers(["--db", path, "--shards", str(shards),
+                              "--jobs", str(p["producer_jobs"])], p["producers"])
+        res.add(f"shards.s{shards}.p{p['producers']}.enqueue_per_s", rate, "jobs/s", "higher")
+
+
+def write_config(tmp: str, name: str, **extra) -> str:
+    """Config file pointing a main.py subprocess at throwaway files."""
+    path = os.path.join(tmp, f"{name}-config.json")
+    cfg = {
+        "db_path": os.path.join(tmp, f"{name}.db"),
+        "log_dir": os.path.join(tmp, f"{name}-logs"),
+        "blob_dir": os.path.join(tmp, f"{name}-blobs"),
+        "socket_path": os.path.join(tmp, f"{name}.sock"),
+    }
+    cfg.update(extra)
+    with open(path, "w") as f:
+        json.dump(cfg, f)
+    return path
+
+
+def bench_daemon(res: Results, tmp: str, p: dict):
+    cfg_path = write_config(tmp, "daemon")
+    with open(cfg_path) as f:
+        sock = json.load(f)["socket_path"]
+    env = dict(os.environ, QUEUECTL_CONFIG=cfg_path)
+    server = subprocess.Popen([sys.executable, "main.py", "serve"], cwd=BASE_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(sock):
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("enqueue daemon did not come up")
+            time.sleep(0.05)
+
+        producers = p["producers"]
+        per = p["daemon_jobs"] // producers
+        rate = run_producers(["--socket", sock, "--pipeline", "--jobs", str(per)], producers)
+        res.add(f"daemon.pipelined.p{producers}.enqueue_per_s", rate, "jobs/s", "higher")
+        rate = run_producers(["--socket", sock, "--jobs", str(per // 10)], producers)
+        res.add(f"daemon.single.p{producers}.enqueue_per_s", rate, "jobs/s", "higher")
+        ms = time_command([sys.executable, "main.py", "enqueue", "echo", "hi"], env, p["startup_runs"])
+        res.add("daemon.cli_enqueue.ms", ms, "ms", "lower")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def time_command(argv: List[str], env: dict, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(argv, cwd=BASE_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+
+def bench_startup(res: Results, tmp: str, p: dict):
+    # point main.py at throwaway files through its own config mechanism;
+    # no daemon runs on this socket, so enqueue takes the direct path
+    env = dict(os.environ, QUEUECTL_CONFIG=write_config(tmp, "startup"))
+    runs = p["startup_runs"]
+
+    bare = time_command([sys.executable, "-c", "pass"], env, runs)
+    res.add("startup.python.ms", bare, "ms", "lower")
+    commands = {
+        "help": ["main.py", "--help"],
+        "enqueue": ["main.py", "enqueue", "echo", "hi"],
+    }
+    for name, argv in commands.items():
+        ms = time_command([sys.executable] + argv, env, runs)
+        res.add(f"startup.{name}.ms", ms, "ms", "lower")
+        overhead = ms - bare
+        if overhead > STARTUP_BUDGET_MS[name]:
+            res.over_budget.append(name)
+            print(f"  OVER BUDGET: {name} adds {overhead:.1f} ms (budget {STARTUP_BUDGET_MS[name]} ms)")
+
+
+SUITES = {
+    "startup": bench_startup,
+    "enqueue": bench_enqueue,
+    "claim": bench_claim,
+    "job": bench_job,
+    "e2e": bench_e2e,
+    "shards": bench_shards,
+    "daemon": bench_daemon,
+}
+
+
+# ------------------------
+# Baseline comparison
+# ------------------------
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    print(f"\nvs baseline ({baseline['meta'].get('timestamp')}, threshold {threshold:.0%}):")
+    for name, base in baseline["metrics"].items():
+        cur = current["metrics"].get(name)
+        if cur is None or not base["value"]:
+            continue
+        change = (cur["value"] - base["value"]) / base["value"]
+        worse = -change if base["better"] == "higher" else change
+        flag = "REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"  {name:<44} {base['value']:>12.2f} -> {cur['value']:>12.2f} ({change:+.1%}) {flag}")
+    return regressions
+
+
+def git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="queue benchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES),
+                        help="suite to run (repeatable, default all)")
+    parser.add_argument("--out", help="results file (default bench/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"also write the results to {os.path.relpath(BASELINE_FILE, BASE_DIR)}")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative change counted as a regression (default 0.15)")
+    args = parser.parse_args(argv)
+
+    profile = "quick" if args.quick else "full"
+    params = PROFILES[profile]
+    suites = args.suite or list(SUITES)
+
+    res = Results()
+    with tempfile.TemporaryDirectory(prefix="queue-bench-") as tmp:
+        # logs and default paths of this run (and of the workers / producers
+        # it starts) stay in the temp dir, never in the repo
+        os.environ["QUEUECTL_CONFIG"] = config.CONFIG_FILE = write_config(tmp, "bench")
+        config.load_config()
+        logger.setLevel(logging.WARNING)
+        for name in suites:
+            print(f"[{name}]")
+            SUITES[name](res, tmp, params)
+
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    current = {
+        "meta": {
+            "timestamp": stamp,
+            "profile": profile,
+            "suites": suites,
+            "params": params,
+            "git": git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "metrics": res.metrics,
+        "over_budget": res.over_budget,
+    }
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nwrote {out}")
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"wrote {BASELINE_FILE}")
+
+    failed = bool(res.over_budget)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        failed = bool(compare(current, baseline, args.threshold)) or failed
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,27 @@
+# bench/jobs.py
+"""Synthetic handlers enqueued by the benchmarks (python mode)."""
+import time
+
+
+def noop(**_):
+    return None
+
+
+def cpu(n: int = 20000, **_):
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+def sleep(ms: float = 5, **_):
+    time.sleep(ms / 1000.0)
+
+
+def bulk(**_):
+    return None
+
+
+def bulk_batch(payloads):
+    # batch form of bulk(); workers claim up to batch_max_size of these at once
+    return [None] * len(payloads)
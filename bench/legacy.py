@@ -0,0 +1,75 @@
+# bench/legacy.py
+"""
+The Job representation before slotted jobs and integer timestamps, kept so
+the `job` suite can measure both sides: a dataclass with a per-instance
+__dict__, ISO-8601 text timestamps (one datetime round trip per state
+change), built from a dict copy of each row.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from queue import config
+from queue.job import JOB_PENDING, JOB_PROCESSING, JOB_COMPLETED
+from queue.utils import format_timestamp
+
+
+def now_timestamp() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def legacy_row(row) -> Dict[str, Any]:
+    """A current sqlite3.Row as the old schema returned it: a dict with text timestamps."""
+    d = dict(row)
+    d["created_at"] = format_timestamp(d["created_at"])
+    d["updated_at"] = format_timestamp(d["updated_at"])
+    return d
+
+
+@dataclass
+class LegacyJob:
+    id: str
+    command: str
+    payload: Optional[Any] = None
+    mode: str = "cli"
+    state: str = JOB_PENDING
+    attempts: int = 0
+    max_retries: Optional[int] = None
+    created_at: str = ""
+    updated_at: str = ""
+    depends_on: List[str] = field(default_factory=list)
+    payload_codec: Optional[str] = None
+    payload_ref: Optional[str] = None
+
+    def __post_init__(self):
+        if self.max_retries is None:
+            config.ensure_loaded()
+            self.max_retries = config.MAX_RETRIES
+        if not self.created_at:
+            self.created_at = now_timestamp()
+        if not self.updated_at:
+            self.updated_at = now_timestamp()
+
+    def mark_processing(self):
+        self.state = JOB_PROCESSING
+        self.updated_at = now_timestamp()
+
+    def mark_completed(self):
+        self.state = JOB_COMPLETED
+        self.updated_at = now_timestamp()
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> "LegacyJob":
+        return LegacyJob(
+            id=d["id"],
+            command=d["command"],
+            payload=d.get("payload"),
+            mode=d.get("mode") or ("python" if d.get("is_dynamic") else "cli"),
+            state=d.get("state", JOB_PENDING),
+            attempts=int(d.get("attempts", 0)),
+            max_retries=int(d["max_retries"]) if d.get("max_retries") is not None else None,
+            created_at=d.get("created_at", now_timestamp()),
+            updated_at=d.get("updated_at", now_timestamp()),
+            payload_codec=d.get("payload_codec"),
+            payload_ref=d.get("payload_ref"),
+        )
@@ -0,0 +1,54 @@
+# bench/producer.py
+"""
+Producer process used by the shard and daemon benchmarks.
+
+Enqueues --jobs no-op jobs and prints a JSON report on stdout with its
+start / end timestamps. With --db it commits one row per job; with
+--socket it goes through the enqueue daemon, one request at a time or
+pipelined (--pipeline).
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+
+from queue.client import Client, enqueue_request
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench.producer")
+    parser.add_argument("--db")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--socket")
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--jobs", type=int, required=True)
+    args = parser.parse_args()
+
+    if args.socket:
+        client = Client(args.socket)
+        start = time.time()
+        if args.pipeline:
+            client.enqueue_many([enqueue_request("bench.jobs.noop", use_python=True)
+                                 for _ in range(args.jobs)])
+        else:
+            for _ in range(args.jobs):
+                client.enqueue("bench.jobs.noop", use_python=True)
+        client.close()
+    else:
+        from queue.db import init_db
+        from queue.manager import QueueManager
+        from queue.utils import logger
+
+        logger.setLevel(logging.WARNING)
+        init_db(args.db, args.shards)
+        qm = QueueManager()
+
+        start = time.time()
+        for _ in range(args.jobs):
+            qm.enqueue("bench.jobs.noop", use_python=True)
+    json.dump({"jobs": args.jobs, "start": start, "end": time.time()}, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
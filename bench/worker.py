@@ -0,0 +1,59 @@
+# bench/worker.py
+"""
+Worker process used by the end-to-end benchmark.
+
+Drains the given database once and prints a JSON report on stdout:
+first claim / last finish timestamps, jobs processed and peak RSS.
+"""
+import sys
+import json
+import time
+import logging
+import resource
+import argparse
+
+from queue.db import init_db
+from queue.worker import Worker
+from queue.utils import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench.worker")
+    parser.add_argument("--db", required=True)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    init_db(args.db)
+    worker = Worker()
+
+    processed = 0
+    first = last = None
+    idle = 0
+    # a claim can also come back empty when another worker holds the write
+    # lock, so only stop after a few misses in a row
+    while idle < 3:
+        t = time.time()
+        n = worker.run_once()
+        if not n:
+            idle += 1
+            time.sleep(0.02)
+            continue
+        idle = 0
+        if first is None:
+            first = t
+        last = time.time()
+        processed += n
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_kb = rss / 1024 if sys.platform == "darwin" else rss
+    json.dump({
+        "processed": processed,
+        "first": first,
+        "last": last,
+        "maxrss_kb": rss_kb,
+    }, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
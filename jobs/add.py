@@ -7,6 +7,18 @@ def run(payload):
     print("[ADD] Result =", a + b)
     return a + b
 
+def run_batch(payloads):
+    """Batch entry: workers hand over many pending jobs at once"""
+    results = []
+    for p in payloads:
+        try:
+            results.append(p["a"] + p["b"])
+        except (KeyError, TypeError) as e:
+            # fail just this item; the rest of the batch still succeeds
+            results.append(ValueError(f"bad payload {p!r}: {e!r}"))
+    print("[ADD] Batch results =", results)
+    return results
+
 # CLI mode entry
 if __name__ == "__main__":
     if len(sys.argv) != 3:
@@ -2,16 +2,14 @@
 
 import argparse
 import json
-from queue.manager import QueueManager
-from queue.worker import Worker
-from queue.dlq import DLQ
 from queue.config import load_config
-from queue.utils import logger
+
+# Everything else is imported inside the command that needs it: `--help` and
+# `enqueue` are run from cron-driven producers and must start fast, and
+# config.json has to be loaded before the database, logger or metrics exist.
 
 def main():
     load_config()  # ensure config loaded
-    qm = QueueManager()
-    dlq = DLQ()
 
     parser = argparse.ArgumentParser(
         prog="queuectl",
@@ -29,25 +27,62 @@ def main():
     p_enqueue.add_argument("job_name", help="Job name (module.func)")
     p_enqueue.add_argument("--payload", type=str,
                            help="JSON string of arguments for Python job")
+    p_enqueue.add_argument("--depends-on", action="append", default=[], metavar="JOB_ID",
+                           help="Job id that must complete first (repeatable)")
+    p_enqueue.add_argument("--no-daemon", action="store_true",
+                           help="Write to the database even if an enqueue daemon is running")
     p_enqueue.add_argument("args", nargs="*", help="Arguments for CLI job")
 
+    # --------------------------
+    # workflow
+    # --------------------------
+    p_wf = sub.add_parser("workflow", help="Enqueue a DAG of jobs from a JSON file")
+    p_wf.add_argument("file", help='JSON object: {"name": {"command": ..., "depends_on": [...]}, ...}')
+
     # --------------------------
     # list
     # --------------------------
     sub.add_parser("list", help="List all jobs")
 
+    # --------------------------
+    # stats
+    # --------------------------
+    sub.add_parser("stats", help="Job counts per state")
+
     # --------------------------
     # start workers
     # --------------------------
     p_sw = sub.add_parser("start-workers", help="Start worker")
     p_sw.add_argument("--poll", type=int, default=None)
+    p_sw.add_argument("--shard", type=int, default=None,
+                      help="Home shard to claim from first (default: pid modulo shard count)")
+    p_sw.add_argument("--batch-size", type=int, default=None,
+                      help="Max jobs per run_batch() call (1 disables batching)")
+    p_sw.add_argument("--batch-wait-ms", type=int, default=None,
+                      help="How long to wait for a batch to fill")
+    p_sw.add_argument("--autoscale", metavar="MIN:MAX", default=None,
+                      help="Supervise MIN..MAX worker processes sized by queue depth")
+    p_sw.add_argument("--status-fd", type=int, default=None, help=argparse.SUPPRESS)
+
+    # --------------------------
+    # serve
+    # --------------------------
+    p_srv = sub.add_parser("serve", help="Run the enqueue daemon on a Unix socket")
+    p_srv.add_argument("--socket", default=None, help="Socket path (default: config socket_path)")
+    p_srv.add_argument("--commit-interval-ms", type=int, default=None,
+                       help="Group-commit window")
+
+    # --------------------------
+    # gc
+    # --------------------------
+    sub.add_parser("gc", help="Delete offloaded payload blobs no job references any more")
 
     # --------------------------
     # dlq
     # --------------------------
     p_dlq = sub.add_parser("dlq", help="DLQ operations")
     p_dlq.add_argument("action", choices=["list", "retry", "purge"])
-    p_dlq.add_argument("--id", type=int)
+    p_dlq.add_argument("--id")
 
     args = parser.parse_args()
 
@@ -55,30 +90,91 @@ def main():
     # Commands
     # ----------------------------------------------------------
 
+    if args.command in ("workflow", "list", "stats"):
+        from queue.manager import QueueManager
+        qm = QueueManager()
+
     if args.command == "enqueue":
+        from queue.utils import logger
+        from queue.client import try_enqueue
+
         if args.python:
             # For Python jobs, pass payload JSON string
             payload_dict = json.loads(args.payload) if args.payload else {}
             cmd = args.job_name
-            job_id = qm.enqueue(cmd, payload=payload_dict, use_python=True)
         else:
             # For CLI jobs
+            payload_dict = None
             cmd = " ".join([args.job_name] + args.args)
-            job_id = qm.enqueue(cmd, use_python=False)
+
+        # fast path: hand the job to a running daemon (main.py serve)
+        job_id = None
+        if not args.no_daemon:
+            job_id = try_enqueue(cmd, payload=payload_dict, use_python=args.python,
+                                 depends_on=args.depends_on)
+        if job_id is None:
+            from queue.manager import QueueManager
+            job_id = QueueManager().enqueue(cmd, payload=payload_dict, use_python=args.python,
+                                            depends_on=args.depends_on)
 
         logger.info(f"Enqueued job id={job_id} (python={args.python}) -> {cmd}")
 
+    elif args.command == "workflow":
+        with open(args.file, "r") as f:
+            nodes = json.load(f)
+        for name, job_id in qm.enqueue_workflow(nodes).items():
+            print(f"{name}: {job_id}")
+
     elif args.command == "list":
-        for job in qm.list_jobs():
+        for job in qm.list_jobs(with_payloads=True):
             print(job.to_dict())
 
+    elif args.command == "stats":
+        for state, n in sorted(qm.stats().items()):
+            print(f"{state:<12} {n}")
+
+    elif args.command == "serve":
+        from queue.server import EnqueueServer
+
+        EnqueueServer(path=args.socket, interval_ms=args.commit_interval_ms).serve_forever()
+
+    elif args.command == "start-workers" and args.autoscale:
+        from queue.supervisor import AutoscalePolicy, Supervisor, parse_range
+
+        if args.shard is not None:
+            parser.error("--shard cannot be combined with --autoscale (shards are assigned per worker)")
+        try:
+            low, high = parse_range(args.autoscale)
+            policy = AutoscalePolicy(low, high)
+        except ValueError as e:
+            parser.error(str(e))
+        # forwarded to every worker the supervisor starts
+        worker_args = []
+        for flag, value in (("--poll", args.poll), ("--batch-size", args.batch_size),
+                            ("--batch-wait-ms", args.batch_wait_ms)):
+            if value is not None:
+                worker_args += [flag, str(value)]
+        Supervisor(policy, worker_args).run()
+
     elif args.command == "start-workers":
-        worker = Worker(poll_interval=args.poll)
+        from queue.worker import Worker
+
+        worker = Worker(poll_interval=args.poll, batch_size=args.batch_size,
+                        batch_wait_ms=args.batch_wait_ms, shard=args.shard,
+                        status_fd=args.status_fd)
         worker.start()
 
+    elif args.command == "gc":
+        from queue.blobstore import collect_garbage
+
+        print(f"Deleted {collect_garbage()} unreferenced blob(s)")
+
     elif args.command == "dlq":
+        from queue.dlq import DLQ
+
+        dlq = DLQ()
         if args.action == "list":
-            for j in dlq.list():
+            for j in dlq.list_all():
                 print(j)
         elif args.action == "retry":
             if not args.id:
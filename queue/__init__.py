@@ -1,8 +1,21 @@
 # queue/__init__.py
-from .config import load_config
-from .manager import QueueManager
-from .worker import Worker
-from .dlq import DLQ
-from .metrics import metrics
+# Exports are resolved lazily (PEP 562) so `import queue` stays cheap and
+# side-effect free: nothing touches the database, log files or metrics until
+# one of these names is actually used.
+import importlib
+
+_EXPORTS = {
+    "load_config": ".config",
+    "QueueManager": ".manager",
+    "Worker": ".worker",
+    "DLQ": ".dlq",
+    "metrics": ".metrics",
+}
 
 __all__ = ["load_config", "QueueManager", "Worker", "DLQ", "metrics"]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,126 @@
+# queue/blobstore.py
+"""
+Content-addressed store for payloads too large to keep inline in SQLite.
+
+Blobs live at <blob_dir>/<sha256[:2]>/<sha256[2:]>; identical payloads share
+one file. Nothing touches the disk until the first put().
+
+A blob is deleted once no unfinished job and no DLQ row references it:
+eagerly when its job completes or is purged (release_blobs), and by the
+`main.py gc` sweep (collect_garbage). A producer stores the blob before it
+inserts the row, so blobs written or re-used within blob_gc_grace seconds
+are never deleted.
+"""
+import os
+import time
+import hashlib
+import tempfile
+
+from typing import Iterable, Iterator, Optional
+
+from . import config
+
+
+class BlobStore:
+    def __init__(self, root: Optional[str] = None):
+        if root is None:
+            config.ensure_loaded()
+            root = config.BLOB_DIR
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            try:
+                os.utime(path)   # re-used: restart the grace period
+                return digest
+            except FileNotFoundError:
+                pass   # deleted just now; write it again
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write-then-rename so readers never see a partial blob
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError as e:
+            raise ValueError(f"Payload blob missing: {digest}") from e
+
+    def delete(self, digest: str, grace: float = 0.0) -> bool:
+        """Remove a blob unless it was written or re-used in the last `grace` seconds."""
+        path = self._path(digest)
+        try:
+            if time.time() - os.path.getmtime(path) < grace:
+                return False
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass   # directory still holds other blobs
+        return True
+
+    def digests(self) -> Iterator[str]:
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            sub = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(sub):
+                continue
+            for name in os.listdir(sub):
+                if not name.startswith(".tmp-"):
+                    yield prefix + name
+
+
+# Module-level store (built on first use) & simple wrappers
+_store: Optional[BlobStore] = None
+
+
+def get_store() -> BlobStore:
+    global _store
+    if _store is None:
+        _store = BlobStore()
+    return _store
+
+
+def put_blob(data: bytes) -> str:
+    return get_store().put(data)
+
+
+def get_blob(digest: str) -> bytes:
+    return get_store().get(digest)
+
+
+def release_blobs(digests: Iterable[Optional[str]]) -> int:
+    """Delete the blobs of finished jobs that no other row still references."""
+    wanted = {d for d in digests if d}
+    if not wanted:
+        return 0
+    from .db import referenced_blobs
+    config.ensure_loaded()
+    store = get_store()
+    return sum(store.delete(d, config.BLOB_GC_GRACE) for d in wanted - referenced_blobs(wanted))
+
+
+def collect_garbage() -> int:
+    """Sweep the whole blob store; returns how many blobs were deleted."""
+    from .db import referenced_blobs
+    config.ensure_loaded()
+    store = get_store()
+    in_use = referenced_blobs()
+    return sum(store.delete(d, config.BLOB_GC_GRACE) for d in list(store.digests()) if d not in in_use)
@@ -0,0 +1,163 @@
+# queue/client.py
+"""
+Thin client for the enqueue daemon (`main.py serve`).
+
+Wire format, both directions: a 4-byte big-endian length followed by that
+many bytes of UTF-8 JSON. Requests are {"op": "enqueue", "command": ...,
+"payload": ..., "use_python": ..., "max_retries": ..., "depends_on": [...]}
+or {"op": "ping"}; replies are {"ok": true, "id": ...} or {"ok": false,
+"error": ...}. Replies come back in request order, so a client may pipeline
+many requests before reading.
+
+Kept import-light on purpose: producers that talk to the daemon never load
+sqlite3, logging or the job module.
+"""
+import os
+import json
+import socket
+import struct
+from typing import Any, Dict, List, Optional
+
+from . import config
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+
+def send_frame(sock: socket.socket, obj: Dict[str, Any]):
+    body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _read_exact(rfile, n: int) -> Optional[bytes]:
+    data = rfile.read(n)
+    if not data:
+        return None
+    if len(data) < n:
+        raise ConnectionError("connection closed mid-frame")
+    return data
+
+
+def recv_frame(rfile) -> Optional[Dict[str, Any]]:
+    """Read one frame from a buffered socket file; None on a clean EOF."""
+    header = _read_exact(rfile, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError(f"Frame too large: {size} bytes")
+    body = _read_exact(rfile, size)
+    if body is None:
+        raise ConnectionError("connection closed mid-frame")
+    return json.loads(body)
+
+
+def socket_path() -> str:
+    config.ensure_loaded()
+    return config.SOCKET_PATH
+
+
+def enqueue_request(command: str, payload: Optional[dict] = None, use_python: bool = False,
+                    max_retries: Optional[int] = None, depends_on: Optional[List[str]] = None) -> Dict[str, Any]:
+    req = {"op": "enqueue", "command": command, "use_python": use_python}
+    if payload:
+        req["payload"] = payload
+    if max_retries is not None:
+        req["max_retries"] = max_retries
+    if depends_on:
+        req["depends_on"] = list(depends_on)
+    return req
+
+
+class Client:
+    # requests in flight before the client starts reading replies; keeps both
+    # sides from blocking on full socket buffers
+    WINDOW = 512
+
+    def __init__(self, path: Optional[str] = None, timeout: float = 10.0):
+        self.path = path or socket_path()
+        self.timeout = timeout
+        self._sock = None
+        self._rfile = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            self._rfile = sock.makefile("rb")
+        return self._sock
+
+    def close(self):
+        if self._sock is not None:
+            self._rfile.close()
+            self._sock.close()
+            self._sock = self._rfile = None
+
+    def _reply(self) -> Dict[str, Any]:
+        resp = recv_frame(self._rfile)
+        if resp is None:
+            raise ConnectionError("daemon closed the connection")
+        return resp
+
+    def request_many(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Pipeline raw requests; returns the raw replies in order."""
+        sock = self._connect()
+        replies = []
+        sent = 0
+        while len(replies) < len(requests):
+            while sent < len(requests) and sent - len(replies) < self.WINDOW:
+                send_frame(sock, requests[sent])
+                sent += 1
+            replies.append(self._reply())
+        return replies
+
+    def ping(self) -> bool:
+        return bool(self.request_many([{"op": "ping"}])[0].get("ok"))
+
+    def enqueue(self, command: str, payload: Optional[dict] = None, use_python: bool = False,
+                max_retries: Optional[int] = None, depends_on: Optional[List[str]] = None) -> str:
+        """Enqueue one job; returns its id once the daemon has committed it."""
+        return self.enqueue_many([enqueue_request(command, payload, use_python, max_retries, depends_on)])[0]
+
+    def enqueue_many(self, requests: List[Dict[str, Any]]) -> List[str]:
+        """
+        Pipeline several enqueue requests (see enqueue_request()). Returns the
+        job ids in order; raises ValueError for the first rejected request.
+        """
+        ids = []
+        for resp in self.request_many(requests):
+            if not resp.get("ok"):
+                raise ValueError(resp.get("error", "enqueue rejected by daemon"))
+            ids.append(resp["id"])
+        return ids
+
+
+def try_enqueue(command: str, **kwargs) -> Optional[str]:
+    """
+    CLI fast path: enqueue through the daemon if one is listening, else
+    return None so the caller falls back to writing the database directly.
+    """
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    client = Client(path)
+    try:
+        client._connect()
+    except OSError:
+        # stale socket file or daemon not accepting; nothing was sent
+        return None
+    # once connected, errors propagate: falling back could enqueue twice
+    with client:
+        return client.enqueue(command, **kwargs)
@@ -0,0 +1,107 @@
+# queue/codec.py
+"""
+Payload codecs.
+
+Every row records how its payload was written in payload_codec, as
+"<serializer>[+<compression>]", e.g. "json", "msgpack+zlib", "json+zstd".
+NULL means plain JSON text, which is what rows written before codecs
+existed contain. msgpack and zstd are optional dependencies, imported on
+first use so the default json codec never pays for them at start-up.
+"""
+import json
+import zlib
+from typing import Any, Dict, Optional, Tuple, Union
+
+DEFAULT_CODEC = "json"
+
+_optional: Dict[str, Any] = {}   # package name -> imported module
+
+
+def _require(name: str):
+    module = _optional.get(name)
+    if module is None:
+        try:
+            module = _optional[name] = __import__(name)
+        except ImportError:
+            raise ValueError(f"Payload codec '{name}' needs the '{name}' package (pip install {name})")
+    return module
+
+
+# ------------------------
+# Serializers
+# ------------------------
+def _json_dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    return json.loads(data)
+
+
+def _msgpack_dumps(obj: Any) -> bytes:
+    return _require("msgpack").packb(obj, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return _require("msgpack").unpackb(data, raw=False)
+
+
+SERIALIZERS = {
+    "json": (_json_dumps, _json_loads),
+    "msgpack": (_msgpack_dumps, _msgpack_loads),
+}
+
+
+# ------------------------
+# Compression
+# ------------------------
+def _zstd_compress(data: bytes) -> bytes:
+    return _require("zstandard").ZstdCompressor().compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return _require("zstandard").ZstdDecompressor().decompress(data)
+
+
+COMPRESSORS = {
+    "zlib": (zlib.compress, zlib.decompress),
+    "zstd": (_zstd_compress, _zstd_decompress),
+}
+
+
+def codec_name(serializer: str = DEFAULT_CODEC, compression: Optional[str] = None) -> str:
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Unknown payload serializer: {serializer}")
+    if compression in (None, "", "none"):
+        return serializer
+    if compression not in COMPRESSORS:
+        raise ValueError(f"Unknown payload compression: {compression}")
+    return f"{serializer}+{compression}"
+
+
+def encode(payload: Any, serializer: str = DEFAULT_CODEC,
+           compression: Optional[str] = None) -> Tuple[Union[str, bytes], str]:
+    """
+    Serialize (and optionally compress) a payload. Returns (data, codec name).
+    Uncompressed JSON stays a str so it is stored as readable TEXT.
+    """
+    name = codec_name(serializer, compression)
+    data = SERIALIZERS[serializer][0](payload)
+    if "+" in name:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        data = COMPRESSORS[compression][0](data)
+    return data, name
+
+
+def decode(data: Union[str, bytes], name: Optional[str]) -> Any:
+    serializer, _, compression = (name or DEFAULT_CODEC).partition("+")
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Unknown payload codec: {name}")
+    if compression:
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown payload codec: {name}")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        data = COMPRESSORS[compression][1](data)
+    return SERIALIZERS[serializer][1](data)
@@ -3,10 +3,15 @@ import os
 import json
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-CONFIG_FILE = os.path.join(BASE_DIR, "config.json")
+CONFIG_FILE = os.environ.get("QUEUECTL_CONFIG", os.path.join(BASE_DIR, "config.json"))
+
+# Other modules read these as config.NAME at use time (never `from .config
+# import NAME`), so values from config.json are seen even by modules that
+# were imported before load_config() ran.
 
 # Defaults (module-level)
 DB_PATH = os.path.join(BASE_DIR, "queue.db")
+SHARDS = 1                              # >1 splits the store into queue-0.db ... queue-(N-1).db
 LOG_DIR = os.path.join(BASE_DIR, "logs")
 LOG_LEVEL = "INFO"
 RETRY_BACKOFF_BASE = 2.0
@@ -14,9 +19,27 @@ MAX_RETRIES = 3
 METRICS_ENABLED = False
 METRICS_INTERVAL = 10
 WORKER_POLL_INTERVAL = 2
+BATCH_MAX_SIZE = 32                     # jobs per run_batch() call; 1 disables batching
+BATCH_MAX_WAIT_MS = 0                   # how long a worker may wait to fill a batch
+PAYLOAD_CODEC = "json"                  # "json" or "msgpack"
+PAYLOAD_COMPRESSION = "none"            # "none", "zlib" or "zstd"
+PAYLOAD_OFFLOAD_THRESHOLD = 256 * 1024  # bytes; larger encoded payloads go to the blob store
+BLOB_DIR = os.path.join(BASE_DIR, "blobs")
+BLOB_GC_GRACE = 60                      # seconds a freshly written blob is safe from cleanup
+SOCKET_PATH = os.path.join(BASE_DIR, "queue.sock")   # enqueue daemon (main.py serve)
+COMMIT_INTERVAL_MS = 5                  # daemon group-commit window
+COMMIT_MAX_BATCH = 1000                 # max jobs per group commit
+AUTOSCALE_INTERVAL = 2                  # seconds between supervisor samples
+AUTOSCALE_BACKLOG_PER_WORKER = 50       # pending jobs per worker before scaling up
+AUTOSCALE_MAX_WAIT = 30                 # seconds the oldest pending job may wait before scaling up
+AUTOSCALE_IDLE_UTILIZATION = 0.3        # mean worker busy fraction below which scaling down is allowed
+AUTOSCALE_UP_COOLDOWN = 10              # seconds between scale-ups
+AUTOSCALE_DOWN_COOLDOWN = 60            # seconds after any change before scaling down
+WORKER_DRAIN_TIMEOUT = 300              # seconds a retiring worker gets to finish before SIGKILL
 
 DEFAULT_CONFIG = {
     "db_path": DB_PATH,
+    "shards": SHARDS,
     "log_dir": LOG_DIR,
     "log_level": LOG_LEVEL,
     "retry_backoff_base": RETRY_BACKOFF_BASE,
@@ -24,15 +47,45 @@ DEFAULT_CONFIG = {
     "metrics_enabled": METRICS_ENABLED,
     "metrics_interval": METRICS_INTERVAL,
     "worker_poll_interval": WORKER_POLL_INTERVAL,
+    "batch_max_size": BATCH_MAX_SIZE,
+    "batch_max_wait_ms": BATCH_MAX_WAIT_MS,
+    "payload_codec": PAYLOAD_CODEC,
+    "payload_compression": PAYLOAD_COMPRESSION,
+    "payload_offload_threshold": PAYLOAD_OFFLOAD_THRESHOLD,
+    "blob_dir": BLOB_DIR,
+    "blob_gc_grace": BLOB_GC_GRACE,
+    "socket_path": SOCKET_PATH,
+    "commit_interval_ms": COMMIT_INTERVAL_MS,
+    "commit_max_batch": COMMIT_MAX_BATCH,
+    "autoscale_interval": AUTOSCALE_INTERVAL,
+    "autoscale_backlog_per_worker": AUTOSCALE_BACKLOG_PER_WORKER,
+    "autoscale_max_wait": AUTOSCALE_MAX_WAIT,
+    "autoscale_idle_utilization": AUTOSCALE_IDLE_UTILIZATION,
+    "autoscale_up_cooldown": AUTOSCALE_UP_COOLDOWN,
+    "autoscale_down_cooldown": AUTOSCALE_DOWN_COOLDOWN,
+    "worker_drain_timeout": WORKER_DRAIN_TIMEOUT,
 }
 
+_loaded = False
+
+def ensure_loaded():
+    """Load config.json once; every lazily built resource calls this first."""
+    if not _loaded:
+        load_config()
+
 def load_config():
     """
     Load config.json if present and update module-level variables.
     Returns the final config dict.
     """
-    global DB_PATH, LOG_DIR, LOG_LEVEL, RETRY_BACKOFF_BASE
+    global _loaded, DB_PATH, SHARDS, LOG_DIR, LOG_LEVEL, RETRY_BACKOFF_BASE
     global MAX_RETRIES, METRICS_ENABLED, METRICS_INTERVAL, WORKER_POLL_INTERVAL
+    global BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+    global PAYLOAD_CODEC, PAYLOAD_COMPRESSION, PAYLOAD_OFFLOAD_THRESHOLD, BLOB_DIR, BLOB_GC_GRACE
+    global SOCKET_PATH, COMMIT_INTERVAL_MS, COMMIT_MAX_BATCH
+    global AUTOSCALE_INTERVAL, AUTOSCALE_BACKLOG_PER_WORKER, AUTOSCALE_MAX_WAIT
+    global AUTOSCALE_IDLE_UTILIZATION, AUTOSCALE_UP_COOLDOWN, AUTOSCALE_DOWN_COOLDOWN
+    global WORKER_DRAIN_TIMEOUT
 
     cfg = DEFAULT_CONFIG.copy()
     if os.path.exists(CONFIG_FILE):
@@ -45,6 +98,7 @@ def load_config():
             pass
 
     DB_PATH = cfg.get("db_path", DB_PATH)
+    SHARDS = max(1, int(cfg.get("shards", SHARDS)))
     LOG_DIR = cfg.get("log_dir", LOG_DIR)
     LOG_LEVEL = cfg.get("log_level", LOG_LEVEL)
     RETRY_BACKOFF_BASE = float(cfg.get("retry_backoff_base", RETRY_BACKOFF_BASE))
@@ -52,5 +106,23 @@ def load_config():
     METRICS_ENABLED = bool(cfg.get("metrics_enabled", METRICS_ENABLED))
     METRICS_INTERVAL = int(cfg.get("metrics_interval", METRICS_INTERVAL))
     WORKER_POLL_INTERVAL = int(cfg.get("worker_poll_interval", WORKER_POLL_INTERVAL))
+    BATCH_MAX_SIZE = int(cfg.get("batch_max_size", BATCH_MAX_SIZE))
+    BATCH_MAX_WAIT_MS = int(cfg.get("batch_max_wait_ms", BATCH_MAX_WAIT_MS))
+    PAYLOAD_CODEC = cfg.get("payload_codec", PAYLOAD_CODEC)
+    PAYLOAD_COMPRESSION = cfg.get("payload_compression", PAYLOAD_COMPRESSION)
+    PAYLOAD_OFFLOAD_THRESHOLD = int(cfg.get("payload_offload_threshold", PAYLOAD_OFFLOAD_THRESHOLD))
+    BLOB_DIR = cfg.get("blob_dir", BLOB_DIR)
+    BLOB_GC_GRACE = float(cfg.get("blob_gc_grace", BLOB_GC_GRACE))
+    SOCKET_PATH = cfg.get("socket_path", SOCKET_PATH)
+    COMMIT_INTERVAL_MS = int(cfg.get("commit_interval_ms", COMMIT_INTERVAL_MS))
+    COMMIT_MAX_BATCH = int(cfg.get("commit_max_batch", COMMIT_MAX_BATCH))
+    AUTOSCALE_INTERVAL = float(cfg.get("autoscale_interval", AUTOSCALE_INTERVAL))
+    AUTOSCALE_BACKLOG_PER_WORKER = int(cfg.get("autoscale_backlog_per_worker", AUTOSCALE_BACKLOG_PER_WORKER))
+    AUTOSCALE_MAX_WAIT = float(cfg.get("autoscale_max_wait", AUTOSCALE_MAX_WAIT))
+    AUTOSCALE_IDLE_UTILIZATION = float(cfg.get("autoscale_idle_utilization", AUTOSCALE_IDLE_UTILIZATION))
+    AUTOSCALE_UP_COOLDOWN = float(cfg.get("autoscale_up_cooldown", AUTOSCALE_UP_COOLDOWN))
+    AUTOSCALE_DOWN_COOLDOWN = float(cfg.get("autoscale_down_cooldown", AUTOSCALE_DOWN_COOLDOWN))
+    WORKER_DRAIN_TIMEOUT = float(cfg.get("worker_drain_timeout", WORKER_DRAIN_TIMEOUT))
 
+    _loaded = True
     return cfg
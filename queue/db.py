@@ -1,15 +1,21 @@
 # queue/db.py
 import sqlite3
 import threading
-from typing import Optional, List, Dict, Any
-from .job import Job
-from .utils import logger
-from .config import DB_PATH
+from typing import Optional, List, Dict, Any, Iterable, Set
+from .job import Job, ROW_COLUMNS, JOB_PENDING, JOB_PROCESSING, JOB_COMPLETED, JOB_BLOCKED
+from .utils import logger, now_us, parse_timestamp
+from . import config
 
 _lock = threading.Lock()
 
+# everything but the payload: claims and listings never drag payload bytes along
+JOB_COLUMNS = ", ".join(ROW_COLUMNS)
+
 class Database:
-    def __init__(self, path: str = DB_PATH):
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            config.ensure_loaded()
+            path = config.DB_PATH
         self.path = path
         self._local = threading.local()
         self._ensure_tables()
@@ -33,10 +39,34 @@ class Database:
                 state TEXT,
                 attempts INTEGER,
                 max_retries INTEGER,
-                created_at TEXT,
-                updated_at TEXT
+                created_at INTEGER,
+                updated_at INTEGER,
+                remaining_deps INTEGER DEFAULT 0,
+                payload_codec TEXT,
+                payload_ref TEXT
+            )
+        """)
+        # dependency edges: a row lives until its parent completes
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS job_deps (
+                parent_id TEXT,
+                child_id TEXT,
+                PRIMARY KEY (parent_id, child_id)
             )
         """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_job_deps_child ON job_deps (child_id)")
+        # sharded stores only: children on other shards to notify when a parent
+        # here finishes (their job_deps edge lives on the child's shard)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS remote_children (
+                parent_id TEXT,
+                child_id TEXT,
+                child_shard INTEGER,
+                PRIMARY KEY (parent_id, child_id)
+            )
+        """)
+        # store layout (shard count / index), checked by _open()
+        cur.execute("CREATE TABLE IF NOT EXISTS queue_meta (key TEXT PRIMARY KEY, value TEXT)")
         cur.execute("""
             CREATE TABLE IF NOT EXISTS dlq (
                 id TEXT PRIMARY KEY,
@@ -44,30 +74,291 @@ class Database:
                 payload TEXT,
                 attempts INTEGER,
                 max_retries INTEGER,
-                created_at TEXT,
-                updated_at TEXT
+                created_at INTEGER,
+                updated_at INTEGER,
+                is_dynamic INTEGER DEFAULT 0,
+                payload_codec TEXT,
+                payload_ref TEXT
             )
         """)
+        # older queue.db files predate these columns
+        self._ensure_column(cur, "jobs", "remaining_deps", "INTEGER DEFAULT 0")
+        self._ensure_column(cur, "jobs", "payload_codec", "TEXT")
+        self._ensure_column(cur, "jobs", "payload_ref", "TEXT")
+        self._ensure_column(cur, "dlq", "is_dynamic", "INTEGER DEFAULT 0")
+        self._ensure_column(cur, "dlq", "payload_codec", "TEXT")
+        self._ensure_column(cur, "dlq", "payload_ref", "TEXT")
+        conn.commit()
+        self._migrate_timestamps("jobs")
+        self._migrate_timestamps("dlq")
+        # claims and queue_depth(): oldest pending first, without a scan or sort
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state_created ON jobs (state, created_at)")
+        # referenced_blobs(): only offloaded payloads are indexed
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_payload_ref ON jobs (payload_ref) "
+                    "WHERE payload_ref IS NOT NULL")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_dlq_payload_ref ON dlq (payload_ref) "
+                    "WHERE payload_ref IS NOT NULL")
         conn.commit()
 
-    # CRUD helpers (thread-safe by sqlite locking + module-level lock)
-    def insert_job(self, job: Job):
+    def _ensure_column(self, cur, table: str, column: str, decl: str):
+        cols = {r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+        if column not in cols:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    def _migrate_timestamps(self, table: str):
+        """
+        Older files declare created_at / updated_at as TEXT (ISO-8601). TEXT
+        affinity would turn integers back into strings, so the table is rebuilt
+        with INTEGER columns and the values converted, in one transaction.
+        """
+        conn = self._conn()
+        info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        if all(r[2].upper() != "TEXT" for r in info if r[1] in ("created_at", "updated_at")):
+            return
+
+        # exact, unlike julianday(), which keeps milliseconds at best
+        conn.create_function("iso_to_us", 1, lambda v: None if v is None else parse_timestamp(v),
+                             deterministic=True)
+
+        def _rebuild(cur):
+            (ddl,) = cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+            for col in ("created_at", "updated_at"):
+                ddl = ddl.replace(f"{col} TEXT", f"{col} INTEGER")
+            cols = [r[1] for r in info]
+            select = ", ".join(f"iso_to_us({c})" if c in ("created_at", "updated_at") else c for c in cols)
+            cur.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+            cur.execute(ddl)
+            cur.execute(f"INSERT INTO {table} ({', '.join(cols)}) SELECT {select} FROM {table}_old")
+            cur.execute(f"DROP TABLE {table}_old")
+
+        self._transaction(_rebuild)
+        logger.info(f"[DB] {self.path}: converted {table} timestamps to epoch microseconds")
+
+    def layout(self, shards: int, index: int):
+        """
+        Record which shard of how many this file is, or check it against what
+        an earlier run recorded. Jobs are placed by hash(id) % shards, so
+        opening the same files with another count would misroute them.
+        """
+        conn = self._conn()
+        for key, value in (("shards", shards), ("shard_index", index)):
+            conn.execute("INSERT OR IGNORE INTO queue_meta (key, value) VALUES (?, ?)", (key, str(value)))
+        conn.commit()
+        stored = dict(conn.execute("SELECT key, value FROM queue_meta").fetchall())
+        if (int(stored["shards"]), int(stored["shard_index"])) == (shards, index):
+            return
+        left = self.unfinished()
+        if left:
+            raise RuntimeError(
+                f"{self.path} is shard {stored['shard_index']} of {stored['shards']} and still holds {left} "
+                f"unfinished job(s) / DLQ entries, but config asks for {shards} shard(s). Drain the queue "
+                f"and the DLQ before changing 'shards', or keep the old value.")
+        # nothing left to misroute: adopt the new layout
+        conn.executemany("UPDATE queue_meta SET value=? WHERE key=?",
+                         [(str(shards), "shards"), (str(index), "shard_index")])
+        conn.commit()
+
+    def unfinished(self) -> int:
+        """Jobs not yet completed plus DLQ rows: what a layout change would strand."""
+        return sum(n for state, n in self.count_by_state().items() if state != JOB_COMPLETED)
+
+    def _transaction(self, fn, *args):
+        """Run fn(cur, *args) inside BEGIN IMMEDIATE ... COMMIT, rolling back on error."""
         conn = self._conn()
         cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(cur, *args)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    # CRUD helpers (thread-safe by sqlite locking + module-level lock)
+    def _insert_job(self, cur, job: Job, remote: Set[str] = frozenset()):
+        """
+        Insert one job plus its dependency edges. Parents that already completed
+        are skipped; parents sitting in the DLQ send the new job straight there.
+        Parents in `remote` live on another shard: the edge is recorded and
+        counted here, ShardedDatabase checks and links the parent side.
+        """
+        remaining = 0
+        dead_parent = False
+        for parent_id in dict.fromkeys(job.depends_on):
+            if parent_id in remote:
+                cur.execute("INSERT OR IGNORE INTO job_deps (parent_id, child_id) VALUES (?, ?)", (parent_id, job.id))
+                remaining += 1
+                continue
+            cur.execute("SELECT state FROM jobs WHERE id=?", (parent_id,))
+            row = cur.fetchone()
+            if row is None:
+                cur.execute("SELECT 1 FROM dlq WHERE id=?", (parent_id,))
+                if cur.fetchone() is None:
+                    raise ValueError(f"Unknown dependency: {parent_id}")
+                dead_parent = True
+            elif row["state"] == JOB_COMPLETED:
+                continue
+            cur.execute("INSERT OR IGNORE INTO job_deps (parent_id, child_id) VALUES (?, ?)", (parent_id, job.id))
+            remaining += 1
+
+        if remaining and job.state == JOB_PENDING:
+            job.state = JOB_BLOCKED
+
         cur.execute("""
-            INSERT INTO jobs (id, command, payload, is_dynamic, state, attempts, max_retries, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (job.id, job.command, job.payload, 1 if job.is_dynamic else 0, job.state, job.attempts, job.max_retries, job.created_at, job.updated_at))
-        conn.commit()
+            INSERT INTO jobs (id, command, payload, is_dynamic, state, attempts, max_retries, created_at, updated_at,
+                              remaining_deps, payload_codec, payload_ref)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (job.id, job.command, job.payload, 1 if job.is_dynamic else 0, job.state, job.attempts, job.max_retries, job.created_at, job.updated_at,
+              remaining, job.payload_codec, job.payload_ref))
+
+        if dead_parent:
+            logger.warning(f"[DEPS] {job.id} depends on a dead job, moving to DLQ")
+            self._bury(cur, [job.id])
+
+    def insert_job(self, job: Job, remote: Set[str] = frozenset()):
+        self._transaction(self._insert_job, job, remote)
+
+    def insert_jobs(self, jobs: List[Job], remote: Set[str] = frozenset()):
+        """Insert several jobs in one transaction; parents must come before their children."""
+        def _insert_all(cur):
+            for job in jobs:
+                self._insert_job(cur, job, remote)
+        self._transaction(_insert_all)
+
+    def _update_job(self, cur, job: Job):
+        # the payload is immutable after insert (and usually not loaded), so it is never written back
+        cur.execute("""
+            UPDATE jobs SET command=?, is_dynamic=?, state=?, attempts=?, max_retries=?, created_at=?, updated_at=?
+            WHERE id=?
+        """, (job.command, 1 if job.is_dynamic else 0, job.state, job.attempts, job.max_retries, job.created_at, job.updated_at, job.id))
 
     def update_job(self, job: Job):
         conn = self._conn()
         cur = conn.cursor()
+        self._update_job(cur, job)
+        conn.commit()
+
+    def _complete_job(self, cur, job: Job):
+        self._update_job(cur, job)
+        return self._release_children(cur, job.id)
+
+    def _release_children(self, cur, parent_id: str) -> int:
+        """Drop parent_id's outgoing edges; returns how many children became pending."""
         cur.execute("""
-            UPDATE jobs SET command=?, payload=?, is_dynamic=?, state=?, attempts=?, max_retries=?, created_at=?, updated_at=?
-            WHERE id=?
-        """, (job.command, job.payload, 1 if job.is_dynamic else 0, job.state, job.attempts, job.max_retries, job.created_at, job.updated_at, job.id))
+            UPDATE jobs SET remaining_deps = remaining_deps - 1
+            WHERE id IN (SELECT child_id FROM job_deps WHERE parent_id=?)
+        """, (parent_id,))
+        cur.execute("""
+            UPDATE jobs SET state=?
+            WHERE state=? AND remaining_deps <= 0
+              AND id IN (SELECT child_id FROM job_deps WHERE parent_id=?)
+        """, (JOB_PENDING, JOB_BLOCKED, parent_id))
+        released = cur.rowcount
+        cur.execute("DELETE FROM job_deps WHERE parent_id=?", (parent_id,))
+        return released
+
+    def complete_job(self, job: Job) -> int:
+        """
+        Persist a completed job and release its dependents in the same
+        transaction. Returns how many children became pending.
+        """
+        return self._transaction(self._complete_job, job)
+
+    def complete_jobs(self, jobs: List[Job]) -> int:
+        """complete_job() for a whole batch, in one transaction."""
+        def _complete_all(cur):
+            return sum(self._complete_job(cur, job) for job in jobs)
+        return self._transaction(_complete_all)
+
+    def requeue_jobs(self, job_ids: List[str]) -> int:
+        """Put jobs a dead worker had claimed back to pending; rows no longer processing are left alone."""
+        if not job_ids:
+            return 0
+        conn = self._conn()
+        marks = ",".join("?" * len(job_ids))
+        cur = conn.execute(f"UPDATE jobs SET state=?, updated_at=? WHERE state=? AND id IN ({marks})",
+                           [JOB_PENDING, now_us(), JOB_PROCESSING] + list(job_ids))
         conn.commit()
+        return cur.rowcount
+
+    # ------------------------
+    # Cross-shard dependencies (used by ShardedDatabase)
+    # ------------------------
+    def job_state(self, job_id: str) -> Optional[str]:
+        """State of a job in this file, "dlq" for a DLQ row, None if unknown."""
+        cur = self._tuple_cursor()
+        row = cur.execute("SELECT state FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row:
+            return row[0]
+        return "dlq" if cur.execute("SELECT 1 FROM dlq WHERE id=?", (job_id,)).fetchone() else None
+
+    def _link_remote_child(self, cur, parent_id: str, child_id: str, child_shard: int) -> str:
+        cur.execute("SELECT state FROM jobs WHERE id=?", (parent_id,))
+        row = cur.fetchone()
+        if row is None and cur.execute("SELECT 1 FROM dlq WHERE id=?", (parent_id,)).fetchone() is None:
+            return "release"   # purged from the DLQ meanwhile
+        if row is not None and row[0] == JOB_COMPLETED:
+            return "release"
+        cur.execute("INSERT OR IGNORE INTO remote_children (parent_id, child_id, child_shard) VALUES (?, ?, ?)",
+                    (parent_id, child_id, child_shard))
+        return "wait" if row is not None else "bury"
+
+    def link_remote_child(self, parent_id: str, child_id: str, child_shard: int) -> str:
+        """
+        Parent side of a cross-shard edge. Returns "wait" (registered; the
+        parent will notify), "release" (parent already completed or purged)
+        or "bury" (parent is in the DLQ). Runs under the write lock, so a
+        concurrent completion either sees the registration or happened first.
+        """
+        return self._transaction(self._link_remote_child, parent_id, child_id, child_shard)
+
+    def remote_children(self, parent_ids: List[str]):
+        """(parent_id, child_id, child_shard) rows for these parents."""
+        cur = self._tuple_cursor()
+        marks = ",".join("?" * len(parent_ids))
+        cur.execute(f"SELECT parent_id, child_id, child_shard FROM remote_children WHERE parent_id IN ({marks})",
+                    list(parent_ids))
+        return cur.fetchall()
+
+    def drop_remote_child(self, parent_id: str, child_id: str):
+        conn = self._conn()
+        conn.execute("DELETE FROM remote_children WHERE parent_id=? AND child_id=?", (parent_id, child_id))
+        conn.commit()
+
+    def remote_edges(self):
+        """(parent_id, child_id) edges of live jobs here whose parent is not in this file."""
+        cur = self._tuple_cursor()
+        cur.execute("""
+            SELECT parent_id, child_id FROM job_deps
+            WHERE child_id IN (SELECT id FROM jobs)
+              AND parent_id NOT IN (SELECT id FROM jobs) AND parent_id NOT IN (SELECT id FROM dlq)
+        """)
+        return cur.fetchall()
+
+    def _release_edge(self, cur, parent_id: str, child_id: str) -> int:
+        cur.execute("DELETE FROM job_deps WHERE parent_id=? AND child_id=?", (parent_id, child_id))
+        if not cur.rowcount:
+            return 0   # already released: replays are harmless
+        cur.execute("UPDATE jobs SET remaining_deps = remaining_deps - 1 WHERE id=?", (child_id,))
+        cur.execute("UPDATE jobs SET state=? WHERE id=? AND state=? AND remaining_deps <= 0",
+                    (JOB_PENDING, child_id, JOB_BLOCKED))
+        return cur.rowcount
+
+    def release_edge(self, parent_id: str, child_id: str) -> int:
+        """Child side of a finished remote parent; returns 1 if the child became pending."""
+        return self._transaction(self._release_edge, parent_id, child_id)
+
+    def _bury_tree(self, cur, job_id: str) -> List[str]:
+        if cur.execute("SELECT 1 FROM jobs WHERE id=?", (job_id,)).fetchone() is None:
+            return []
+        ids = [job_id] + self._dependents(cur, job_id)
+        self._bury(cur, ids)
+        return ids
+
+    def bury_tree(self, job_id: str) -> List[str]:
+        """Move a job whose remote parent died, plus its dependents here, to the DLQ."""
+        return self._transaction(self._bury_tree, job_id)
 
     def delete_job(self, job_id: str):
         conn = self._conn()
@@ -75,11 +366,16 @@ class Database:
         cur.execute("DELETE FROM jobs WHERE id=?", (job_id,))
         conn.commit()
 
-    def fetch_jobs(self) -> List[Dict[str, Any]]:
-        conn = self._conn()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM jobs")
-        return [dict(r) for r in cur.fetchall()]
+    def _tuple_cursor(self):
+        # plain tuples for Job.from_row(): no sqlite3.Row or dict per row
+        cur = self._conn().cursor()
+        cur.row_factory = None
+        return cur
+
+    def fetch_jobs(self) -> List[Job]:
+        cur = self._tuple_cursor()
+        cur.execute(f"SELECT {JOB_COLUMNS} FROM jobs")
+        return [Job.from_row(r) for r in cur.fetchall()]
 
     def fetch_job_by_id(self, job_id: str) -> Optional[Dict[str, Any]]:
         conn = self._conn()
@@ -88,37 +384,163 @@ class Database:
         row = cur.fetchone()
         return dict(row) if row else None
 
-    def fetch_next_pending_job(self) -> Optional[Dict[str, Any]]:
+    def fetch_payload(self, job_id: str):
+        """Raw (still encoded) payload of one job, loaded only when it is about to run."""
+        conn = self._conn()
+        cur = conn.cursor()
+        cur.execute("SELECT payload FROM jobs WHERE id=?", (job_id,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def fetch_payloads(self, job_ids: List[str]) -> Dict[str, Any]:
         conn = self._conn()
         cur = conn.cursor()
+        marks = ",".join("?" * len(job_ids))
+        cur.execute(f"SELECT id, payload FROM jobs WHERE id IN ({marks})", list(job_ids))
+        return {r[0]: r[1] for r in cur.fetchall()}
+
+    def fetch_pending_batch(self, command: str, limit: int, home: int = 0) -> List[Job]:
+        """Claim up to `limit` pending python jobs for one handler (oldest first)."""
+        conn = self._conn()
+        cur = self._tuple_cursor()
+        if not self._has_pending(cur, command):
+            return []
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(f"""
+                SELECT {JOB_COLUMNS} FROM jobs
+                WHERE state = ? AND is_dynamic = 1 AND command = ?
+                ORDER BY created_at ASC LIMIT ?
+            """, ("pending", command, limit))
+            jobs = [Job.from_row(r) for r in cur.fetchall()]
+            if jobs:
+                cur.executemany("UPDATE jobs SET state=? WHERE id=?",
+                                [("processing", job.id) for job in jobs])
+            conn.commit()
+            return jobs
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            logger.error(f"DB fetch lock error: {e}")
+            return []
+
+    def fetch_next_pending_job(self, home: int = 0) -> Optional[Job]:
+        # `home` only matters for ShardedDatabase; a single file has one shard
+        conn = self._conn()
+        cur = self._tuple_cursor()
+        if not self._has_pending(cur):
+            return None
         try:
             # take lock via BEGIN IMMEDIATE to avoid race conditions
             cur.execute("BEGIN IMMEDIATE")
-            cur.execute("SELECT * FROM jobs WHERE state = ? ORDER BY created_at ASC LIMIT 1", ("pending",))
+            cur.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE state = ? ORDER BY created_at ASC LIMIT 1", ("pending",))
             row = cur.fetchone()
             if not row:
                 conn.commit()
                 return None
-            job_dict = dict(row)
+            job = Job.from_row(row)
             # mark as processing immediately
-            cur.execute("UPDATE jobs SET state=? WHERE id=?", ("processing", job_dict["id"]))
+            cur.execute("UPDATE jobs SET state=? WHERE id=?", ("processing", job.id))
             conn.commit()
-            return job_dict
+            return job
         except sqlite3.OperationalError as e:
             logger.error(f"DB fetch lock error: {e}")
             return None
 
-    # DLQ operations
-    def add_to_dlq(self, job: Job):
+    @staticmethod
+    def _has_pending(cur, command: Optional[str] = None) -> bool:
+        """
+        Read-only peek (idx_jobs_state_created) before a claim, so idle workers
+        polling an empty file never take its write lock.
+        """
+        if command is None:
+            cur.execute("SELECT 1 FROM jobs WHERE state = ? LIMIT 1", ("pending",))
+        else:
+            cur.execute("SELECT 1 FROM jobs WHERE state = ? AND is_dynamic = 1 AND command = ? LIMIT 1",
+                        ("pending", command))
+        return cur.fetchone() is not None
+
+    def count_by_state(self) -> Dict[str, int]:
+        """Job counts per state, plus the DLQ size under "dlq"."""
         conn = self._conn()
         cur = conn.cursor()
+        cur.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        counts = {r[0]: r[1] for r in cur.fetchall()}
+        cur.execute("SELECT COUNT(*) FROM dlq")
+        counts["dlq"] = cur.fetchone()[0]
+        return counts
+
+    def queue_depth(self) -> Dict[str, Any]:
+        """Claimable backlog: pending count and created_at of the oldest pending job."""
+        conn = self._conn()
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*), MIN(created_at) FROM jobs WHERE state = ?", (JOB_PENDING,))
+        pending, oldest = cur.fetchone()
+        return {"pending": pending, "oldest_created_at": oldest}
+
+    def referenced_blobs(self, digests: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Blob digests still needed: referenced by a job that has not completed
+        or by a DLQ row. Limited to `digests` when given.
+        """
+        cur = self._tuple_cursor()
+        sql = ("SELECT payload_ref FROM jobs WHERE payload_ref IS NOT NULL AND state != ?{f} "
+               "UNION SELECT payload_ref FROM dlq WHERE payload_ref IS NOT NULL{f}")
+        if digests is None:
+            cur.execute(sql.format(f=""), (JOB_COMPLETED,))
+        else:
+            digests = list(digests)
+            f = f" AND payload_ref IN ({','.join('?' * len(digests))})"
+            cur.execute(sql.format(f=f), [JOB_COMPLETED] + digests + digests)
+        return {r[0] for r in cur.fetchall()}
+
+    # DLQ operations
+    def _bury(self, cur, job_ids: List[str]):
+        """Move rows from jobs into the DLQ as-is (used for failure propagation)."""
+        now = now_us()
+        for job_id in job_ids:
+            cur.execute("""
+                INSERT OR REPLACE INTO dlq (id, command, payload, attempts, max_retries, created_at, updated_at,
+                                            is_dynamic, payload_codec, payload_ref)
+                SELECT id, command, payload, attempts, max_retries, created_at, ?,
+                       is_dynamic, payload_codec, payload_ref
+                FROM jobs WHERE id=?
+            """, (now, job_id))
+            cur.execute("DELETE FROM jobs WHERE id=?", (job_id,))
+
+    def _add_to_dlq(self, cur, job: Job):
+        # payload columns are copied from the row since the in-memory job may not carry them
         cur.execute("""
-            INSERT OR REPLACE INTO dlq (id, command, payload, attempts, max_retries, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (job.id, job.command, job.payload, job.attempts, job.max_retries, job.created_at, job.updated_at))
+            INSERT OR REPLACE INTO dlq (id, command, payload, attempts, max_retries, created_at, updated_at,
+                                        is_dynamic, payload_codec, payload_ref)
+            SELECT id, ?, payload, ?, ?, ?, ?, ?, payload_codec, payload_ref
+            FROM jobs WHERE id=?
+        """, (job.command, job.attempts, job.max_retries, job.created_at, job.updated_at, 1 if job.is_dynamic else 0, job.id))
         # also delete from jobs table
         cur.execute("DELETE FROM jobs WHERE id=?", (job.id,))
-        conn.commit()
+
+        # propagate the failure to everything downstream; edges are kept so a
+        # later restore_dlq knows which parents are still outstanding
+        dependents = self._dependents(cur, job.id)
+        self._bury(cur, dependents)
+        return dependents
+
+    def _dependents(self, cur, job_id: str) -> List[str]:
+        cur.execute("""
+            WITH RECURSIVE dependents(id) AS (
+                SELECT child_id FROM job_deps WHERE parent_id = ?
+                UNION
+                SELECT d.child_id FROM job_deps d JOIN dependents ON d.parent_id = dependents.id
+            )
+            SELECT id FROM dependents
+        """, (job_id,))
+        return [r[0] for r in cur.fetchall()]
+
+    def add_to_dlq(self, job: Job) -> List[str]:
+        """Bury a failed job and its dependents; returns every id that moved."""
+        dependents = self._transaction(self._add_to_dlq, job)
+        if dependents:
+            logger.warning(f"[DEPS] {job.id} failed, moved {len(dependents)} dependent job(s) to DLQ")
+        return [job.id] + dependents
 
     def list_dlq(self) -> List[Dict[str, Any]]:
         conn = self._conn()
@@ -126,62 +548,154 @@ class Database:
         cur.execute("SELECT * FROM dlq")
         return [dict(r) for r in cur.fetchall()]
 
-    def restore_dlq(self, job_id: str) -> bool:
-        conn = self._conn()
-        cur = conn.cursor()
+    def _restore_dlq(self, cur, job_id: str) -> bool:
         cur.execute("SELECT * FROM dlq WHERE id=?", (job_id,))
         row = cur.fetchone()
         if not row:
             return False
         d = dict(row)
+        # parents that have not completed yet still hold an edge to this job
+        cur.execute("SELECT COUNT(*) FROM job_deps WHERE child_id=?", (job_id,))
+        remaining = cur.fetchone()[0]
+        state = JOB_BLOCKED if remaining else JOB_PENDING
         # move back to jobs
         cur.execute("""
-            INSERT OR REPLACE INTO jobs (id, command, payload, is_dynamic, state, attempts, max_retries, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (d["id"], d["command"], d.get("payload"), 0, "pending", d.get("attempts", 0), d.get("max_retries", 3), d.get("created_at"), d.get("updated_at")))
+            INSERT OR REPLACE INTO jobs (id, command, payload, is_dynamic, state, attempts, max_retries, created_at, updated_at,
+                                         remaining_deps, payload_codec, payload_ref)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (d["id"], d["command"], d.get("payload"), d.get("is_dynamic") or 0, state, d.get("attempts", 0), d.get("max_retries", 3), d.get("created_at"), d.get("updated_at"),
+              remaining, d.get("payload_codec"), d.get("payload_ref")))
         cur.execute("DELETE FROM dlq WHERE id=?", (job_id,))
-        conn.commit()
         return True
 
-    def delete_dlq(self, job_id: str):
-        conn = self._conn()
-        cur = conn.cursor()
+    def restore_dlq(self, job_id: str) -> bool:
+        # one transaction, so a parent completing meanwhile cannot leave the counter stale
+        return self._transaction(self._restore_dlq, job_id)
+
+    def _delete_dlq(self, cur, job_id: str) -> int:
         cur.execute("DELETE FROM dlq WHERE id=?", (job_id,))
-        conn.commit()
+        # a purged job never completes: drop the dependency on it instead of
+        # leaving children blocked on an edge nothing would release
+        return self._release_children(cur, job_id)
+
+    def delete_dlq(self, job_id: str):
+        released = self._transaction(self._delete_dlq, job_id)
+        if released:
+            logger.warning(f"[DEPS] {job_id} purged, released {released} dependent job(s)")
+
+# Module-level DB instance (opened on first use) & simple wrappers
+_db = None   # Database or ShardedDatabase
 
-# Module-level DB instance & simple wrappers
-_db = Database(DB_PATH)
+def _open(path: str, shards: int):
+    import os
+    from .shards import ShardedDatabase, shard_paths
 
-def init_db():
-    # no-op because Database() already ensures tables, but keep API
-    return
+    # files of another layout (queue.db vs queue-N.db, or shards past the
+    # configured count) are never read again: refuse while they hold work
+    others = [path] if shards > 1 else []
+    i = shards if shards > 1 else 0
+    while os.path.exists(shard_paths(path, i + 1)[i]):
+        others.append(shard_paths(path, i + 1)[i])
+        i += 1
+    for other in others:
+        if os.path.exists(other):
+            left = Database(other).unfinished()
+            if left:
+                raise RuntimeError(
+                    f"{other} still holds {left} unfinished job(s) / DLQ entries that shards={shards} "
+                    f"would never read; drain it first, or keep the old value.")
+    if shards > 1:
+        return ShardedDatabase(shard_paths(path, shards))
+    db = Database(path)
+    db.layout(1, 0)
+    return db
+
+def get_db():
+    """The module-level Database (or ShardedDatabase when config.SHARDS > 1)."""
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                config.ensure_loaded()
+                _db = _open(config.DB_PATH, config.SHARDS)
+    return _db
+
+def init_db(path: Optional[str] = None, shards: Optional[int] = None):
+    """
+    Database() already ensures tables; passing a path (and shard count) points
+    the module-level wrappers at different files (used by the benchmarks).
+    """
+    global _db
+    if path is None:
+        return get_db()
+    _db = _open(path, shards or 1)
+    return _db
+
+def shard_count() -> int:
+    db = get_db()
+    return len(db.shards) if hasattr(db, "shards") else 1
 
 def insert_job(job: Job):
-    _db.insert_job(job)
+    get_db().insert_job(job)
+
+def insert_jobs(jobs: List[Job]):
+    get_db().insert_jobs(jobs)
 
 def update_job(job: Job):
-    _db.update_job(job)
+    get_db().update_job(job)
+
+def complete_job(job: Job) -> int:
+    return get_db().complete_job(job)
+
+def complete_jobs(jobs: List[Job]) -> int:
+    return get_db().complete_jobs(jobs)
+
+def requeue_jobs(job_ids: List[str]) -> int:
+    return get_db().requeue_jobs(job_ids)
 
 def delete_job(job_id: str):
-    _db.delete_job(job_id)
+    get_db().delete_job(job_id)
 
 def fetch_jobs():
-    return _db.fetch_jobs()
+    return get_db().fetch_jobs()
 
 def fetch_job_by_id(job_id: str):
-    return _db.fetch_job_by_id(job_id)
+    return get_db().fetch_job_by_id(job_id)
 
-def fetch_next_pending_job():
-    return _db.fetch_next_pending_job()
+def fetch_payload(job_id: str):
+    return get_db().fetch_payload(job_id)
+
+def fetch_payloads(job_ids: List[str]):
+    return get_db().fetch_payloads(job_ids)
+
+def fetch_pending_batch(command: str, limit: int, home: int = 0):
+    return get_db().fetch_pending_batch(command, limit, home)
+
+def fetch_next_pending_job(home: int = 0):
+    return get_db().fetch_next_pending_job(home)
+
+def count_by_state():
+    return get_db().count_by_state()
+
+def queue_depth():
+    return get_db().queue_depth()
+
+def referenced_blobs(digests: Optional[Iterable[str]] = None):
+    return get_db().referenced_blobs(digests)
 
 def add_to_dlq(job: Job):
-    _db.add_to_dlq(job)
+    get_db().add_to_dlq(job)
+
+def reconcile_deps() -> int:
+    """Replay interrupted cross-shard dependency writes (nothing to do on one file)."""
+    db = get_db()
+    return db.reconcile_deps() if hasattr(db, "reconcile_deps") else 0
 
 def list_dlq():
-    return _db.list_dlq()
+    return get_db().list_dlq()
 
 def restore_dlq(job_id: str):
-    return _db.restore_dlq(job_id)
+    return get_db().restore_dlq(job_id)
 
 def delete_dlq(job_id: str):
-    _db.delete_dlq(job_id)
+    get_db().delete_dlq(job_id)
@@ -1,11 +1,16 @@
 # queue/dlq.py
 from typing import List, Dict
 from .db import list_dlq, restore_dlq, delete_dlq
-from .utils import logger
+from .utils import logger, format_timestamp
 
 class DLQ:
     def list_all(self) -> List[Dict]:
+        """DLQ rows for display, timestamps as ISO-8601 text (like Job.to_dict)."""
         jobs = list_dlq()
+        for j in jobs:
+            for key in ("created_at", "updated_at"):
+                if j.get(key) is not None:
+                    j[key] = format_timestamp(j[key])
         logger.info(f"[DLQ] {len(jobs)} entries")
         return jobs
 
@@ -24,4 +29,8 @@ class DLQ:
             delete_dlq(j["id"])
             cnt += 1
         logger.warning(f"[DLQ] purged {cnt}")
+        refs = [j["payload_ref"] for j in jobs if j.get("payload_ref")]
+        if refs:
+            from .blobstore import release_blobs
+            release_blobs(refs)
         return cnt
@@ -1,13 +1,14 @@
 # queue/job.py
-import uuid
-import json
-import subprocess
+import os
 import importlib
-from dataclasses import dataclass, asdict
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-from .utils import now_timestamp, logger
-from .config import MAX_RETRIES
+from .utils import now_us, format_timestamp, parse_timestamp, logger
+from . import config
+from .codec import encode, decode
+
+# subprocess and the blob store (hashlib, tempfile) are imported where they are
+# used: producers that only enqueue small jobs never need them.
 
 # Job states
 JOB_PENDING = "pending"
@@ -15,25 +16,59 @@ JOB_PROCESSING = "processing"
 JOB_COMPLETED = "completed"
 JOB_FAILED = "failed"
 JOB_DEAD = "dead"
+JOB_BLOCKED = "blocked"              # waiting on unfinished dependencies
+
+# jobs-table columns Job.from_row() expects, in order (no payload: claims and
+# listings never load it)
+ROW_COLUMNS = ("id", "command", "is_dynamic", "state", "attempts", "max_retries",
+               "created_at", "updated_at", "payload_codec", "payload_ref")
 
 
-@dataclass
 class Job:
-    id: str
-    command: str
-    payload: Optional[str] = None      # JSON string
-    mode: str = "cli"                  # "cli" or "python" — default to CLI
-    state: str = JOB_PENDING
-    attempts: int = 0
-    max_retries: int = MAX_RETRIES
-    created_at: str = ""
-    updated_at: str = ""
-
-    def __post_init__(self):
-        if not self.created_at:
-            self.created_at = now_timestamp()
-        if not self.updated_at:
-            self.updated_at = now_timestamp()
+    """
+    One queued job. Slotted, since workers build one per claim: no per-instance
+    __dict__. created_at / updated_at are integer epoch microseconds, as stored;
+    to_dict() is where they become ISO text.
+    """
+    __slots__ = ("id", "command", "payload", "mode", "state", "attempts", "max_retries",
+                 "created_at", "updated_at", "depends_on", "payload_codec", "payload_ref", "shard")
+
+    def __init__(
+        self,
+        id: str,
+        command: str,
+        payload: Optional[Any] = None,      # encoded payload (str or bytes); not loaded by claims
+        mode: str = "cli",                  # "cli" or "python" — default to CLI
+        state: str = JOB_PENDING,
+        attempts: int = 0,
+        max_retries: Optional[int] = None,  # None -> config.MAX_RETRIES
+        created_at: int = 0,
+        updated_at: int = 0,
+        depends_on: Optional[List[str]] = None,   # parent job ids, used on insert only
+        payload_codec: Optional[str] = None,      # see queue/codec.py; None = plain JSON
+        payload_ref: Optional[str] = None,        # blob store digest when the payload was offloaded
+    ):
+        if max_retries is None:
+            config.ensure_loaded()
+            max_retries = config.MAX_RETRIES
+        if not created_at:
+            created_at = now_us()
+        self.id = id
+        self.command = command
+        self.payload = payload
+        self.mode = mode
+        self.state = state
+        self.attempts = attempts
+        self.max_retries = max_retries
+        self.created_at = created_at
+        self.updated_at = updated_at or created_at
+        self.depends_on = depends_on if depends_on is not None else []
+        self.payload_codec = payload_codec
+        self.payload_ref = payload_ref
+        self.shard: Optional[int] = None          # file it was read from (ShardedDatabase only)
+
+    def __repr__(self) -> str:
+        return f"Job(id={self.id!r}, command={self.command!r}, mode={self.mode!r}, state={self.state!r})"
 
     # Dynamic property — computed, not stored
     @property
@@ -45,20 +80,20 @@ class Job:
     # ------------------------
     def mark_processing(self):
         self.state = JOB_PROCESSING
-        self.updated_at = now_timestamp()
+        self.updated_at = now_us()
 
     def mark_completed(self):
         self.state = JOB_COMPLETED
-        self.updated_at = now_timestamp()
+        self.updated_at = now_us()
 
     def mark_failed(self):
         self.state = JOB_FAILED
         self.attempts += 1
-        self.updated_at = now_timestamp()
+        self.updated_at = now_us()
 
     def mark_dead(self):
         self.state = JOB_DEAD
-        self.updated_at = now_timestamp()
+        self.updated_at = now_us()
 
     # ------------------------
     # Execution dispatcher
@@ -73,6 +108,8 @@ class Job:
     # CLI jobs
     # ------------------------
     def _execute_cli(self):
+        import subprocess
+
         logger.info(f"[Job {self.id}] CLI: {self.command}")
         result = subprocess.run(
             self.command,
@@ -96,26 +133,8 @@ class Job:
     # Python jobs (dynamic)
     # ------------------------
     def _execute_dynamic(self):
-        if "." not in self.command:
-            raise ValueError(f"Invalid Python command format: {self.command}")
-
-        module_path, func_name = self.command.rsplit(".", 1)
-
-        try:
-            module = importlib.import_module(module_path)
-        except ModuleNotFoundError as e:
-            raise ValueError(f"Module not found: {module_path}") from e
-
-        func = getattr(module, func_name, None)
-        if func is None or not callable(func):
-            raise ValueError(f"Function '{func_name}' not found or not callable in module '{module_path}'")
-
-        params = {}
-        if self.payload:
-            try:
-                params = json.loads(self.payload)
-            except json.JSONDecodeError as e:
-                raise ValueError(f"Invalid JSON in payload: {self.payload}") from e
+        func = resolve_handler(self.command)
+        params = self.load_payload()
 
         logger.info(f"[Job {self.id}] Running {self.command}(**{params})")
         try:
@@ -126,44 +145,194 @@ class Job:
             logger.error(f"[Job {self.id}] Python function raised: {e}")
             raise
 
+    # ------------------------
+    # Payload
+    # ------------------------
+    def load_payload(self) -> Dict[str, Any]:
+        """Decode the payload, reading it from the blob store if it was offloaded."""
+        if self.payload_ref:
+            from .blobstore import get_blob
+            data = get_blob(self.payload_ref)
+        else:
+            data = self.payload
+        if not data:
+            return {}
+        try:
+            return decode(data, self.payload_codec)
+        except Exception as e:
+            raise ValueError(f"Invalid payload for job {self.id} (codec={self.payload_codec or 'json'})") from e
+
     # ------------------------
     # Serialization
     # ------------------------
     def to_dict(self) -> Dict[str, Any]:
-        d = asdict(self)
-        d.pop("is_dynamic", None)
-        return d
+        """Plain dict for display / export, timestamps as ISO-8601 text."""
+        return {
+            "id": self.id,
+            "command": self.command,
+            "payload": self.payload,
+            "mode": self.mode,
+            "state": self.state,
+            "attempts": self.attempts,
+            "max_retries": self.max_retries,
+            "created_at": format_timestamp(self.created_at),
+            "updated_at": format_timestamp(self.updated_at),
+            "payload_codec": self.payload_codec,
+            "payload_ref": self.payload_ref,
+        }
 
     @staticmethod
     def from_dict(d: Dict[str, Any]) -> "Job":
+        """From a to_dict() result or a full row as a dict (SELECT *)."""
         return Job(
             id=d["id"],
             command=d["command"],
             payload=d.get("payload"),
-            mode=d.get("mode", "cli"),
+            # rows carry is_dynamic rather than mode
+            mode=d.get("mode") or ("python" if d.get("is_dynamic") else "cli"),
             state=d.get("state", JOB_PENDING),
             attempts=int(d.get("attempts", 0)),
-            max_retries=int(d.get("max_retries", MAX_RETRIES)),
-            created_at=d.get("created_at", now_timestamp()),
-            updated_at=d.get("updated_at", now_timestamp()),
+            max_retries=int(d["max_retries"]) if d.get("max_retries") is not None else None,
+            created_at=parse_timestamp(d["created_at"]) if d.get("created_at") else 0,
+            updated_at=parse_timestamp(d["updated_at"]) if d.get("updated_at") else 0,
+            payload_codec=d.get("payload_codec"),
+            payload_ref=d.get("payload_ref"),
         )
 
+    @staticmethod
+    def from_row(row) -> "Job":
+        """From a plain tuple in ROW_COLUMNS order; the claim path, no dicts in between."""
+        job = Job.__new__(Job)
+        (job.id, job.command, is_dynamic, job.state, job.attempts, job.max_retries,
+         job.created_at, job.updated_at, job.payload_codec, job.payload_ref) = row
+        job.mode = "python" if is_dynamic else "cli"
+        job.payload = None
+        job.depends_on = []
+        job.shard = None
+        return job
+
+
+# ------------------------
+# Python handlers
+# ------------------------
+def resolve_handler(command: str):
+    if "." not in command:
+        raise ValueError(f"Invalid Python command format: {command}")
+
+    module_path, func_name = command.rsplit(".", 1)
+
+    try:
+        module = importlib.import_module(module_path)
+    except ModuleNotFoundError as e:
+        raise ValueError(f"Module not found: {module_path}") from e
+
+    func = getattr(module, func_name, None)
+    if func is None or not callable(func):
+        raise ValueError(f"Function '{func_name}' not found or not callable in module '{module_path}'")
+    return func
+
+
+def resolve_batch_handler(command: str):
+    """
+    A handler `pkg.mod.run` supports batching when its module also defines
+    `run_batch(payloads)`: it gets a list of payload dicts and returns one
+    result per payload, in order. Returns None when there is no batch form
+    (or the handler cannot be imported; the single-job path reports that).
+    """
+    if "." not in command:
+        return None
+    module_path, func_name = command.rsplit(".", 1)
+    try:
+        module = importlib.import_module(module_path)
+    except ImportError:
+        return None
+    func = getattr(module, f"{func_name}_batch", None)
+    return func if callable(func) else None
+
+
+def execute_batch(jobs: List[Job], func) -> List[Any]:
+    """
+    Run several python jobs of one handler in a single call.
+
+    Returns one outcome per job: the handler's result, or an Exception for
+    jobs that failed. The handler may put an Exception instance in its result
+    list to fail just that item. If the whole call raises (or returns the
+    wrong number of results), each payload is run again on its own so one
+    bad item cannot fail the rest of the batch.
+    """
+    outcomes: List[Any] = [None] * len(jobs)
+    params, idx = [], []
+    for i, job in enumerate(jobs):
+        try:
+            params.append(job.load_payload())
+            idx.append(i)
+        except Exception as e:
+            outcomes[i] = e
+
+    if not params:
+        return outcomes
+
+    command = jobs[idx[0]].command
+    logger.info(f"[BATCH] Running {command}_batch on {len(params)} payload(s)")
+    try:
+        results = _call_batch(func, command, params)
+    except Exception as e:
+        logger.error(f"[BATCH] {command}_batch raised: {e}; retrying its {len(params)} payload(s) one by one")
+        results = []
+        for p in params:
+            try:
+                results.extend(_call_batch(func, command, [p]))
+            except Exception as item_error:
+                results.append(item_error)
+
+    for i, result in zip(idx, results):
+        outcomes[i] = result
+    return outcomes
+
+
+def _call_batch(func, command: str, params: List[Any]) -> List[Any]:
+    results = list(func(params))
+    if len(results) != len(params):
+        raise ValueError(f"{command}_batch returned {len(results)} results for {len(params)} payloads")
+    return results
+
 
 # ------------------------
 # Factory
 # ------------------------
+def new_job_id() -> str:
+    """Random (version 4) UUID string, without importing uuid (and platform) at start-up."""
+    b = bytearray(os.urandom(16))
+    b[6] = (b[6] & 0x0F) | 0x40
+    b[8] = (b[8] & 0x3F) | 0x80
+    h = b.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
 def create_job(
     command: str,
     payload: Optional[dict] = None,
     max_retries: Optional[int] = None,
-    mode: str = "cli"
+    mode: str = "cli",
+    depends_on: Optional[List[str]] = None
 ) -> Job:
-    payload_json = json.dumps(payload) if payload else None
+    config.ensure_loaded()
+    data = codec = ref = None
+    if payload:
+        data, codec = encode(payload, config.PAYLOAD_CODEC, config.PAYLOAD_COMPRESSION)
+        if len(data) > config.PAYLOAD_OFFLOAD_THRESHOLD:
+            # keep big payloads out of the jobs table; loaded only when the job runs
+            from .blobstore import put_blob
+            ref = put_blob(data.encode("utf-8") if isinstance(data, str) else data)
+            data = None
 
     return Job(
-        id=str(uuid.uuid4()),
+        id=new_job_id(),
         command=command,
-        payload=payload_json,
+        payload=data,
+        payload_codec=codec,
+        payload_ref=ref,
         mode=mode,
-        max_retries=max_retries if max_retries is not None else MAX_RETRIES,
+        max_retries=max_retries,
+        depends_on=list(depends_on or []),
     )
@@ -1,6 +1,7 @@
 # queue/manager.py
-from typing import List, Optional
-from .db import init_db, insert_job, fetch_jobs, fetch_job_by_id, update_job
+from typing import Dict, List, Optional
+from .db import (init_db, insert_job, insert_jobs, fetch_jobs, fetch_job_by_id, fetch_payloads, update_job,
+                 complete_job, count_by_state)
 from .job import Job, create_job
 from .utils import logger
 
@@ -14,35 +15,95 @@ class QueueManager:
         payload: Optional[dict] = None,
         dynamic: bool = False,
         max_retries: Optional[int] = None,
-        use_python: bool = False
+        use_python: bool = False,
+        depends_on: Optional[List[str]] = None
     ) -> str:
         """
         Enqueue a job into SQLite queue.
         mode = "python" when --python flag is passed
         mode = "cli"    for default jobs
+        depends_on = job ids that must complete before this job is claimable
         """
 
-        mode = "python" if use_python else "cli"
-
-# queue/manager.py (inside enqueue method)
-
         job = create_job(
             command=command,
             payload=payload,
             max_retries=max_retries,
-            mode="python" if use_python else "cli"   # <-- set mode instead of dynamic
+            mode="python" if use_python else "cli",   # <-- set mode instead of dynamic
+            depends_on=depends_on
         )
 
-
         insert_job(job)
-        logger.info(f"[ENQUEUE] {job.id} (mode={job.mode}) -> {command}")
-        print("DEBUG mode =", mode)
+        logger.info(f"[ENQUEUE] {job.id} (mode={job.mode}, state={job.state}) -> {command}")
 
         return job.id
 
-    def list_jobs(self) -> List[Job]:
-        rows = fetch_jobs()
-        return [Job.from_dict(r) for r in rows]
+    def enqueue_workflow(self, nodes: Dict[str, dict]) -> Dict[str, str]:
+        """
+        Submit a whole DAG in one transaction.
+
+        nodes maps a local name to enqueue() keyword arguments, e.g.
+            {"a": {"command": "..."}, "c": {"command": "...", "depends_on": ["a", "b"]}}
+        depends_on entries may name other nodes or ids of jobs already queued.
+        Returns {name: job_id}.
+        """
+        # Kahn's algorithm: order parents before children and reject cycles
+        indegree = {name: 0 for name in nodes}
+        children: Dict[str, List[str]] = {name: [] for name in nodes}
+        for name, spec in nodes.items():
+            for dep in spec.get("depends_on") or []:
+                if dep in nodes:
+                    indegree[name] += 1
+                    children[dep].append(name)
+
+        order = [name for name, n in indegree.items() if n == 0]
+        for name in order:
+            for child in children[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    order.append(child)
+        if len(order) != len(nodes):
+            stuck = sorted(name for name, n in indegree.items() if n > 0)
+            raise ValueError(f"Workflow has a dependency cycle through: {', '.join(stuck)}")
+
+        ids: Dict[str, str] = {}
+        jobs = []
+        for name in order:
+            spec = nodes[name]
+            job = create_job(
+                command=spec["command"],
+                payload=spec.get("payload"),
+                max_retries=spec.get("max_retries"),
+                mode="python" if spec.get("use_python") else "cli",
+                depends_on=[ids.get(dep, dep) for dep in spec.get("depends_on") or []]
+            )
+            ids[name] = job.id
+            jobs.append(job)
+
+        insert_jobs(jobs)
+        logger.info(f"[ENQUEUE] workflow with {len(jobs)} job(s)")
+        # a sharded store may re-draw ids to keep the workflow on one shard
+        return {name: job.id for name, job in zip(order, jobs)}
+
+    def list_jobs(self, with_payloads: bool = False) -> List[Job]:
+        """
+        All jobs, oldest first. Listings skip the payload column; pass
+        with_payloads=True to fill in inline payloads (offloaded ones keep
+        only payload_ref).
+        """
+        jobs = fetch_jobs()
+        if with_payloads:
+            inline = [job for job in jobs if not job.payload_ref]
+            for start in range(0, len(inline), 500):   # stay under SQLite's variable limit
+                chunk = inline[start:start + 500]
+                payloads = fetch_payloads([job.id for job in chunk])
+                for job in chunk:
+                    job.payload = payloads.get(job.id)
+        return jobs
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts per state (summed over all shards), plus "dlq"."""
+        return count_by_state()
 
     def get_job(self, job_id: str) -> Optional[Job]:
         r = fetch_job_by_id(job_id)
@@ -56,7 +117,7 @@ class QueueManager:
 
     def mark_completed(self, job: Job):
         job.mark_completed()
-        update_job(job)
+        complete_job(job)
         logger.debug(f"[STATUS] {job.id} -> completed")
 
     def mark_failed(self, job: Job):
@@ -3,7 +3,7 @@ import time
 import threading
 from typing import Dict
 from .utils import logger
-from .config import METRICS_ENABLED, METRICS_INTERVAL
+from . import config
 
 class Metrics:
     def __init__(self):
@@ -11,42 +11,82 @@ class Metrics:
         self.total_failed = 0
         self.total_exec_time = 0.0
         self.worker_heartbeats = {}
+        # supervisor only: latest sample (gauges) and decision counters
+        self.autoscale = {}
+        self.scale_ups = 0
+        self.scale_downs = 0
         self.lock = threading.Lock()
-        if METRICS_ENABLED:
-            t = threading.Thread(target=self._poll, daemon=True)
-            t.start()
+        self._poller_checked = False
+
+    def _ensure_poller(self):
+        # the reporting thread is started on first use, once config is known
+        if self._poller_checked:
+            return
+        with self.lock:
+            if self._poller_checked:
+                return
+            self._poller_checked = True
+            config.ensure_loaded()
+            if config.METRICS_ENABLED:
+                t = threading.Thread(target=self._poll, daemon=True)
+                t.start()
 
     def job_success(self, exec_time: float):
+        self._ensure_poller()
         with self.lock:
             self.total_processed += 1
             self.total_exec_time += exec_time
 
     def job_failure(self):
+        self._ensure_poller()
         with self.lock:
             self.total_failed += 1
 
-    def active_workers(self) -> int:
+    def _active_workers(self) -> int:
         now = time.time()
+        return sum(1 for t in self.worker_heartbeats.values() if now - t <= 10)
+
+    def active_workers(self) -> int:
         with self.lock:
-            return sum(1 for t in self.worker_heartbeats.values() if now - t <= 10)
+            return self._active_workers()
 
     def heartbeat(self, wid: int):
+        self._ensure_poller()
         with self.lock:
             self.worker_heartbeats[wid] = time.time()
 
+    def autoscale_sample(self, **gauges):
+        self._ensure_poller()
+        with self.lock:
+            self.autoscale.update(gauges)
+
+    def scale_event(self, before: int, after: int, reason: str):
+        self._ensure_poller()
+        with self.lock:
+            if after > before:
+                self.scale_ups += 1
+            else:
+                self.scale_downs += 1
+            self.autoscale.update(target=after, last_decision=f"{before}->{after} ({reason})",
+                                  last_decision_at=time.time())
+
     def export(self):
         with self.lock:
             avg = (self.total_exec_time / self.total_processed) if self.total_processed else 0.0
-            return {
+            out = {
                 "processed": self.total_processed,
                 "failed": self.total_failed,
                 "avg_exec_time": round(avg, 4),
-                "active_workers": self.active_workers()
+                "active_workers": self._active_workers()   # lock already held
             }
+            if self.autoscale:
+                out["autoscale"] = dict(self.autoscale, scale_ups=self.scale_ups,
+                                        scale_downs=self.scale_downs)
+            return out
 
     def _poll(self):
         while True:
-            time.sleep(METRICS_INTERVAL)
+            time.sleep(config.METRICS_INTERVAL)
             logger.info(f"[METRICS] {self.export()}")
 
 metrics = Metrics()
@@ -0,0 +1,231 @@
+# queue/server.py
+import os
+import time
+import signal
+import socket
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from .client import send_frame, recv_frame
+from .db import insert_job, insert_jobs
+from .job import Job, create_job
+from .utils import logger
+from . import config
+
+
+class _Request:
+    """One request waiting for the next group commit."""
+    __slots__ = ("conn", "job", "error")
+
+    def __init__(self, conn: "_Connection", job: Optional[Job] = None, error: Optional[str] = None):
+        self.conn = conn
+        self.job = job
+        self.error = error
+
+    def reply(self):
+        if self.error is not None:
+            self.conn.send({"ok": False, "error": self.error})
+        elif self.job is not None:
+            self.conn.send({"ok": True, "id": self.job.id})
+        else:
+            self.conn.send({"ok": True})   # ping
+
+
+class _Connection:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send(self, obj: Dict[str, Any]):
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                send_frame(self.sock, obj)
+            except OSError:
+                self.closed = True
+
+
+class EnqueueServer:
+    """
+    Enqueue daemon on a Unix domain socket (protocol in queue/client.py).
+
+    Connection threads decode requests and append them, in arrival order, to
+    one shared list. A committer thread drains it every commit_interval_ms
+    (or as soon as commit_max_batch jobs are waiting), inserts the whole
+    group in one transaction and only then acknowledges each request. Since
+    every reply goes out in list order, each connection sees its replies in
+    the order it sent its requests.
+    """
+
+    def __init__(self, path: Optional[str] = None, interval_ms: Optional[int] = None,
+                 max_batch: Optional[int] = None):
+        config.ensure_loaded()
+        self.path = path or config.SOCKET_PATH
+        self.interval = (interval_ms if interval_ms is not None else config.COMMIT_INTERVAL_MS) / 1000.0
+        self.max_batch = max_batch or config.COMMIT_MAX_BATCH
+        # readers block once this many requests are waiting (back-pressure)
+        self.max_pending = self.max_batch * 10
+        self._pending: Deque[_Request] = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._listener: Optional[socket.socket] = None
+
+    # ------------------------
+    # Lifecycle
+    # ------------------------
+    def _bind(self):
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise RuntimeError(f"Another daemon is already listening on {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path)   # stale socket from a previous run
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        sock.listen(128)
+        sock.settimeout(0.5)   # wake up regularly to notice stop()
+        self._listener = sock
+
+    def stop(self, *_):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def serve_forever(self):
+        self._bind()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        committer = threading.Thread(target=self._commit_loop, name="group-commit")
+        committer.start()
+        logger.info(f"[SERVE] listening on {self.path} "
+                    f"(commit every {self.interval * 1000:.0f} ms, max {self.max_batch} jobs)")
+        try:
+            while not self._stopping:
+                try:
+                    sock, _ = self._listener.accept()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    if self._stopping:
+                        break
+                    raise
+                threading.Thread(target=self._handle, args=(sock,), daemon=True).start()
+        finally:
+            self.stop()
+            committer.join()   # flushes whatever is still pending
+            self._listener.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            logger.info("[SERVE] stopped")
+
+    # ------------------------
+    # Connections
+    # ------------------------
+    def _handle(self, sock: socket.socket):
+        conn = _Connection(sock)
+        rfile = sock.makefile("rb")
+        try:
+            while not self._stopping:
+                try:
+                    req = recv_frame(rfile)
+                except (ValueError, ConnectionError) as e:
+                    conn.send({"ok": False, "error": f"bad frame: {e}"})
+                    break
+                if req is None:
+                    break
+                self._submit(self._decode(conn, req))
+        except OSError:
+            pass
+        finally:
+            # replies still queued for this connection are dropped by send()
+            with conn.lock:
+                conn.closed = True
+            rfile.close()
+            sock.close()
+
+    def _decode(self, conn: _Connection, req: Dict[str, Any]) -> _Request:
+        op = req.get("op") if isinstance(req, dict) else None
+        if op == "ping":
+            return _Request(conn)
+        if op != "enqueue":
+            return _Request(conn, error=f"unknown op: {op}")
+        try:
+            job = create_job(
+                command=req["command"],
+                payload=req.get("payload"),
+                max_retries=req.get("max_retries"),
+                mode="python" if req.get("use_python") else "cli",
+                depends_on=req.get("depends_on"),
+            )
+        except Exception as e:
+            return _Request(conn, error=str(e))
+        return _Request(conn, job=job)
+
+    def _submit(self, item: _Request):
+        with self._cond:
+            while len(self._pending) >= self.max_pending and not self._stopping:
+                self._cond.wait()
+            self._pending.append(item)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+    # ------------------------
+    # Group commit
+    # ------------------------
+    def _take_batch(self) -> List[_Request]:
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            # give concurrent producers one commit window to join this group
+            deadline = time.monotonic() + self.interval
+            while len(self._pending) < self.max_batch and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(len(self._pending), self.max_batch)
+            batch = [self._pending.popleft() for _ in range(n)]
+            self._cond.notify_all()   # wake readers held back by max_pending
+            return batch
+
+    def _commit_loop(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self._stopping:
+                    return
+                continue
+            self._commit(batch)
+
+    def _commit(self, batch: List[_Request]):
+        # jobs without dependencies share one transaction; jobs with
+        # dependencies go one by one so a bad parent id rejects only that job
+        plain = [r for r in batch if r.job is not None and not r.job.depends_on]
+        linked = [r for r in batch if r.job is not None and r.job.depends_on]
+        t0 = time.perf_counter()
+        if plain:
+            try:
+                insert_jobs([r.job for r in plain])
+            except Exception as e:
+                # nothing in a dependency-free group can be rejected on its
+                # own, so this is a storage error: fail the group, don't retry
+                logger.error(f"[SERVE] group commit of {len(plain)} job(s) failed: {e}")
+                for r in plain:
+                    r.error = str(e)
+        for r in linked:
+            try:
+                insert_job(r.job)
+            except Exception as e:
+                r.error = str(e)
+        committed = sum(1 for r in batch if r.job is not None and r.error is None)
+        logger.debug(f"[SERVE] committed {committed} job(s) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for r in batch:
+            r.reply()
@@ -0,0 +1,305 @@
+# queue/shards.py
+import os
+import zlib
+from collections import Counter
+from typing import Optional, List, Dict, Any, Iterable, Set
+
+from .db import Database
+from .job import Job, new_job_id
+from .utils import logger
+
+
+def shard_paths(db_path: str, shards: int) -> List[str]:
+    """queue.db -> queue-0.db, queue-1.db, ..."""
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}-{i}{ext or '.db'}" for i in range(shards)]
+
+
+class ShardedDatabase:
+    """
+    Same interface as Database, spread over several SQLite files so enqueues
+    and claims on different shards do not serialize on one writer lock.
+
+    Jobs are routed by a hash of their id. A workflow batch is placed on one
+    shard (ids re-drawn until they hash there) so its edges stay local.
+
+    A parent on another shard is a remote edge: the child's shard keeps the
+    job_deps row and the remaining_deps counter as usual, the parent's shard
+    keeps a remote_children row. Completing, burying or purging the parent is
+    followed by a write on the child's shard. The two files are never locked
+    together; every follow-up is idempotent and reconcile_deps() replays any
+    that a crash cut short.
+
+    Every file records the layout it belongs to, and opening it with a
+    different shard count is refused (see Database.layout). Claimed jobs
+    remember the shard they came from, and writes go back there.
+    """
+
+    def __init__(self, paths: List[str]):
+        self.paths = list(paths)
+        self.shards = [Database(p) for p in self.paths]
+        for index, shard in enumerate(self.shards):
+            shard.layout(len(self.shards), index)
+
+    @property
+    def path(self) -> str:
+        return ",".join(self.paths)
+
+    def shard_index(self, job_id: str) -> int:
+        return zlib.crc32(job_id.encode("utf-8")) % len(self.shards)
+
+    def _shard(self, job_id: str) -> Database:
+        return self.shards[self.shard_index(job_id)]
+
+    def _home_of(self, job: Job) -> Database:
+        # the file the job was read from; hashing is only for jobs never read back
+        return self.shards[job.shard if job.shard is not None else self.shard_index(job.id)]
+
+    def _new_id_on(self, index: int) -> str:
+        while True:
+            job_id = new_job_id()
+            if self.shard_index(job_id) == index:
+                return job_id
+
+    def _by_shard(self, jobs: List[Job]) -> Dict[int, List[Job]]:
+        groups: Dict[int, List[Job]] = {}
+        for job in jobs:
+            index = job.shard if job.shard is not None else self.shard_index(job.id)
+            groups.setdefault(index, []).append(job)
+        return groups
+
+    def _steal_order(self, home: int) -> List[int]:
+        # home shard first, then everybody else in a fixed rotation
+        n = len(self.shards)
+        return [(home + i) % n for i in range(n)]
+
+    @staticmethod
+    def _tag(jobs: List[Job], index: int) -> List[Job]:
+        for job in jobs:
+            job.shard = index
+        return jobs
+
+    # ------------------------
+    # Inserts
+    # ------------------------
+    def _colocate(self, jobs: List[Job]) -> int:
+        """Move every job of a workflow batch onto one shard, fixing up the references."""
+        local = {job.id for job in jobs}
+        # the shard most outside parents live on, to keep remote edges few
+        outside = Counter(self.shard_index(p) for job in jobs for p in job.depends_on if p not in local)
+        target = outside.most_common(1)[0][0] if outside else self.shard_index(jobs[0].id)
+
+        renamed: Dict[str, str] = {}
+        for job in jobs:
+            if self.shard_index(job.id) != target:
+                renamed[job.id] = job.id = self._new_id_on(target)
+        for job in jobs:
+            job.depends_on = [renamed.get(p, p) for p in job.depends_on]
+        return target
+
+    def _remote_parents(self, jobs: List[Job], index: int) -> Dict[str, int]:
+        """Parents of `jobs` stored on another shard than `index` -> their shard; unknown ids raise."""
+        remote: Dict[str, int] = {}
+        for job in jobs:
+            for parent_id in job.depends_on:
+                home = self.shard_index(parent_id)
+                if home != index and parent_id not in remote:
+                    if self.shards[home].job_state(parent_id) is None:
+                        raise ValueError(f"Unknown dependency: {parent_id}")
+                    remote[parent_id] = home
+        return remote
+
+    def _insert_on(self, index: int, jobs: List[Job]):
+        remote = self._remote_parents(jobs, index)
+        self.shards[index].insert_jobs(jobs, set(remote))
+        self._tag(jobs, index)
+        for job in jobs:
+            for parent_id in dict.fromkeys(job.depends_on):
+                if parent_id in remote:
+                    self._link(parent_id, remote[parent_id], job.id, index)
+
+    def insert_job(self, job: Job):
+        if job.depends_on:
+            self._insert_on(self.shard_index(job.id), [job])
+        else:
+            self._shard(job.id).insert_job(job)
+
+    def insert_jobs(self, jobs: List[Job]):
+        """
+        Jobs without dependencies are spread by id, one transaction per shard.
+        A batch with dependencies (a workflow) goes to one shard in one
+        transaction; job ids may be re-drawn, so read them after this returns.
+        """
+        if not jobs:
+            return
+        if any(job.depends_on for job in jobs):
+            self._insert_on(self._colocate(jobs), jobs)
+            return
+        for index, group in self._by_shard(jobs).items():
+            self.shards[index].insert_jobs(group)
+
+    # ------------------------
+    # Routed by job id
+    # ------------------------
+    def update_job(self, job: Job):
+        self._home_of(job).update_job(job)
+
+    def complete_job(self, job: Job) -> int:
+        home = self._home_of(job)
+        return home.complete_job(job) + self._release_remote(home, [job.id])
+
+    def complete_jobs(self, jobs: List[Job]) -> int:
+        released = 0
+        for index, group in self._by_shard(jobs).items():
+            released += self.shards[index].complete_jobs(group)
+            released += self._release_remote(self.shards[index], [job.id for job in group])
+        return released
+
+    def requeue_jobs(self, job_ids: List[str]) -> int:
+        groups: Dict[int, List[str]] = {}
+        for job_id in job_ids:
+            groups.setdefault(self.shard_index(job_id), []).append(job_id)
+        return sum(self.shards[index].requeue_jobs(ids) for index, ids in groups.items())
+
+    def delete_job(self, job_id: str):
+        self._shard(job_id).delete_job(job_id)
+
+    def fetch_job_by_id(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._shard(job_id).fetch_job_by_id(job_id)
+
+    def fetch_payload(self, job_id: str):
+        return self._shard(job_id).fetch_payload(job_id)
+
+    def fetch_payloads(self, job_ids: List[str]) -> Dict[str, Any]:
+        groups: Dict[int, List[str]] = {}
+        for job_id in job_ids:
+            groups.setdefault(self.shard_index(job_id), []).append(job_id)
+        out: Dict[str, Any] = {}
+        for index, ids in groups.items():
+            out.update(self.shards[index].fetch_payloads(ids))
+        return out
+
+    def add_to_dlq(self, job: Job) -> List[str]:
+        home = self._home_of(job)
+        buried = home.add_to_dlq(job)
+        return buried + self._bury_remote(home, buried)
+
+    def restore_dlq(self, job_id: str) -> bool:
+        # remote edges of a restored job were kept, so it waits for (and
+        # notifies) its remote parents and children as before
+        return self._shard(job_id).restore_dlq(job_id)
+
+    def delete_dlq(self, job_id: str):
+        home = self._shard(job_id)
+        home.delete_dlq(job_id)
+        released = self._release_remote(home, [job_id])
+        if released:
+            logger.warning(f"[DEPS] {job_id} purged, released {released} dependent job(s) on other shards")
+
+    # ------------------------
+    # Cross-shard dependency follow-ups
+    # ------------------------
+    def _link(self, parent_id: str, parent_shard: int, child_id: str, child_shard: int) -> int:
+        """Register a remote edge with the parent's shard; returns 1 if the child was released."""
+        action = self.shards[parent_shard].link_remote_child(parent_id, child_id, child_shard)
+        if action == "release":
+            return self.shards[child_shard].release_edge(parent_id, child_id)
+        if action == "bury":
+            buried = self.shards[child_shard].bury_tree(child_id)
+            if buried:
+                logger.warning(f"[DEPS] {child_id} depends on a dead job, moving to DLQ")
+                self._bury_remote(self.shards[child_shard], buried)
+        return 0
+
+    def _release_remote(self, home: Database, parent_ids: List[str]) -> int:
+        """Tell children on other shards that these parents are done (completed or purged)."""
+        released = 0
+        for parent_id, child_id, child_shard in home.remote_children(parent_ids):
+            released += self.shards[child_shard].release_edge(parent_id, child_id)
+            home.drop_remote_child(parent_id, child_id)
+        return released
+
+    def _bury_remote(self, home: Database, buried: List[str]) -> List[str]:
+        """Follow a failure into other shards; returns the ids moved to the DLQ there."""
+        moved: List[str] = []
+        work = [(home, buried)]
+        while work:
+            shard, ids = work.pop()
+            # remote_children rows stay: a restored parent still notifies on completion
+            for _, child_id, child_shard in shard.remote_children(ids) if ids else []:
+                more = self.shards[child_shard].bury_tree(child_id)
+                moved.extend(more)
+                work.append((self.shards[child_shard], more))
+        if moved:
+            logger.warning(f"[DEPS] moved {len(moved)} dependent job(s) on other shards to DLQ")
+        return moved
+
+    def reconcile_deps(self) -> int:
+        """
+        Replay the follow-up of every remote edge; a no-op when nothing was
+        interrupted. Returns how many children it released.
+        """
+        released = 0
+        for index, shard in enumerate(self.shards):
+            for parent_id, child_id in shard.remote_edges():
+                parent_shard = self.shard_index(parent_id)
+                if parent_shard == index:
+                    # parent purged from this very shard: nothing left to notify
+                    released += shard.release_edge(parent_id, child_id)
+                    continue
+                released += self._link(parent_id, parent_shard, child_id, index)
+        if released:
+            logger.info(f"[DEPS] reconciled {released} cross-shard dependency edge(s)")
+        return released
+
+    # ------------------------
+    # Claims (home shard first, then steal)
+    # ------------------------
+    def fetch_next_pending_job(self, home: int = 0) -> Optional[Job]:
+        for index in self._steal_order(home):
+            job = self.shards[index].fetch_next_pending_job()
+            if job:
+                job.shard = index
+                return job
+        return None
+
+    def fetch_pending_batch(self, command: str, limit: int, home: int = 0) -> List[Job]:
+        jobs: List[Job] = []
+        for index in self._steal_order(home):
+            if len(jobs) >= limit:
+                break
+            jobs.extend(self._tag(self.shards[index].fetch_pending_batch(command, limit - len(jobs)), index))
+        return jobs
+
+    # ------------------------
+    # Aggregated views
+    # ------------------------
+    def fetch_jobs(self) -> List[Job]:
+        jobs = [job for i, shard in enumerate(self.shards) for job in self._tag(shard.fetch_jobs(), i)]
+        jobs.sort(key=lambda job: job.created_at)
+        return jobs
+
+    def list_dlq(self) -> List[Dict[str, Any]]:
+        rows = [r for shard in self.shards for r in shard.list_dlq()]
+        rows.sort(key=lambda r: r["updated_at"] or 0)
+        return rows
+
+    def count_by_state(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for shard in self.shards:
+            for state, n in shard.count_by_state().items():
+                totals[state] = totals.get(state, 0) + n
+        return totals
+
+    def referenced_blobs(self, digests: Optional[Iterable[str]] = None) -> Set[str]:
+        # identical payloads share a blob, whichever shard their jobs are on
+        digests = None if digests is None else list(digests)
+        return set().union(*(shard.referenced_blobs(digests) for shard in self.shards))
+
+    def queue_depth(self) -> Dict[str, Any]:
+        depths = [shard.queue_depth() for shard in self.shards]
+        oldest = [d["oldest_created_at"] for d in depths if d["oldest_created_at"]]
+        return {
+            "pending": sum(d["pending"] for d in depths),
+            "oldest_created_at": min(oldest) if oldest else None,
+        }
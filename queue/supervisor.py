@@ -0,0 +1,289 @@
+# queue/supervisor.py
+import os
+import sys
+import json
+import math
+import time
+import select
+import signal
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .db import queue_depth, requeue_jobs
+from .metrics import metrics
+from .utils import logger, timestamp_age
+from . import config
+
+
+class AutoscalePolicy:
+    """
+    Decides the worker count from one sample; no I/O, so it can be driven by hand.
+
+    Scale up when the backlog per worker exceeds backlog_per_worker or the
+    oldest pending job has waited longer than max_wait. Scale down, one worker
+    at a time, only when the backlog would still be under half the scale-up
+    threshold with one worker fewer, the oldest job is under half of max_wait,
+    workers are mostly idle, and all of that held for down_after samples in a
+    row. The gap between the two thresholds plus the cooldowns keep the fleet
+    from flapping around a steady load.
+    """
+
+    def __init__(self, min_workers: int, max_workers: int, backlog_per_worker: Optional[int] = None,
+                 max_wait: Optional[float] = None, idle_utilization: Optional[float] = None,
+                 up_cooldown: Optional[float] = None, down_cooldown: Optional[float] = None,
+                 down_after: int = 3):
+        if not 0 <= min_workers <= max_workers or max_workers < 1:
+            raise ValueError(f"Invalid autoscale range {min_workers}:{max_workers}")
+        config.ensure_loaded()
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.backlog_per_worker = backlog_per_worker or config.AUTOSCALE_BACKLOG_PER_WORKER
+        self.max_wait = max_wait if max_wait is not None else config.AUTOSCALE_MAX_WAIT
+        self.idle_utilization = (idle_utilization if idle_utilization is not None
+                                 else config.AUTOSCALE_IDLE_UTILIZATION)
+        self.up_cooldown = up_cooldown if up_cooldown is not None else config.AUTOSCALE_UP_COOLDOWN
+        self.down_cooldown = down_cooldown if down_cooldown is not None else config.AUTOSCALE_DOWN_COOLDOWN
+        self.down_after = down_after
+        self._last_up = float("-inf")
+        self._last_change = float("-inf")
+        self._quiet_samples = 0
+
+    def decide(self, current: int, pending: int, oldest_age: float,
+               utilization: Optional[float], now: float) -> Tuple[int, str]:
+        """Returns (target worker count, reason); target == current means hold."""
+        # bounds are enforced at once and do not start a cooldown
+        if current < self.min_workers:
+            return self.min_workers, "below minimum"
+        if current > self.max_workers:
+            return self.max_workers, "above maximum"
+
+        per_worker = pending / max(current, 1)
+        if per_worker > self.backlog_per_worker or (pending and oldest_age > self.max_wait):
+            self._quiet_samples = 0
+            if current >= self.max_workers:
+                return current, "at maximum"
+            if now - self._last_up < self.up_cooldown:
+                return current, "scale-up cooldown"
+            target = max(current + 1, math.ceil(pending / self.backlog_per_worker))
+            reason = (f"backlog {pending}" if per_worker > self.backlog_per_worker
+                      else f"oldest job waited {oldest_age:.0f}s")
+            return self._changed(current, min(target, self.max_workers), reason, now)
+
+        idle = utilization is None or utilization < self.idle_utilization
+        if (current > self.min_workers and idle and oldest_age < self.max_wait / 2
+                and pending / max(current - 1, 1) < self.backlog_per_worker / 2):
+            self._quiet_samples += 1
+        else:
+            self._quiet_samples = 0
+        if self._quiet_samples < self.down_after:
+            return current, "steady"
+        if now - self._last_change < self.down_cooldown:
+            return current, "scale-down cooldown"
+        return self._changed(current, current - 1, "idle", now)
+
+    def _changed(self, current: int, target: int, reason: str, now: float) -> Tuple[int, str]:
+        if target > current:
+            self._last_up = now
+        self._last_change = now
+        self._quiet_samples = 0
+        return target, reason
+
+
+class _Child:
+    __slots__ = ("proc", "slot", "started", "busy", "holding", "retire_deadline")
+
+    def __init__(self, proc: subprocess.Popen, slot: int):
+        self.proc = proc
+        self.slot = slot
+        self.started = time.monotonic()
+        self.busy: Optional[float] = None   # last reported busy fraction
+        self.holding: List[str] = []         # ids of the jobs it has claimed
+        self.retire_deadline: Optional[float] = None
+
+
+class Supervisor:
+    """
+    `start-workers --autoscale MIN:MAX`: runs worker processes and resizes the
+    pool every autoscale_interval seconds from queue depth, oldest pending
+    age and the utilization the workers report on a shared pipe.
+
+    Retiring a worker sends it SIGTERM; it finishes the job in hand and exits.
+    One that is still running after worker_drain_timeout is killed, and the
+    jobs it reported holding are put back to pending (so are those of a
+    worker that crashed).
+    """
+
+    def __init__(self, policy: AutoscalePolicy, worker_args: Optional[List[str]] = None,
+                 interval: Optional[float] = None):
+        config.ensure_loaded()
+        self.policy = policy
+        self.worker_args = list(worker_args or [])
+        self.interval = interval if interval is not None else config.AUTOSCALE_INTERVAL
+        self.drain_timeout = config.WORKER_DRAIN_TIMEOUT
+        self._active: Dict[int, _Child] = {}     # pid -> child
+        self._retiring: Dict[int, _Child] = {}
+        self._stopping = False
+        # one pipe shared by every worker; lines are shorter than PIPE_BUF so
+        # concurrent writes never interleave
+        self._status_r, self._status_w = os.pipe()
+        os.set_blocking(self._status_r, False)
+        self._status_buf = b""
+
+    def stop(self, *_):
+        self._stopping = True
+
+    # ------------------------
+    # Main loop
+    # ------------------------
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        logger.info(f"[AUTOSCALE] supervising {self.policy.min_workers}..{self.policy.max_workers} "
+                    f"workers (sample every {self.interval}s)")
+        try:
+            while not self._stopping:
+                self.tick()
+                self._wait(self.interval)
+        finally:
+            self.shutdown()
+
+    def tick(self):
+        self._reap()
+        self._read_status()
+        depth = queue_depth()
+        oldest = depth["oldest_created_at"]
+        age = max(0.0, timestamp_age(oldest)) if oldest else 0.0
+        busy = [c.busy for c in self._active.values() if c.busy is not None]
+        utilization = sum(busy) / len(busy) if busy else None
+
+        current = len(self._active)
+        metrics.autoscale_sample(workers=current, retiring=len(self._retiring), pending=depth["pending"],
+                                 oldest_pending_age=round(age, 1),
+                                 utilization=None if utilization is None else round(utilization, 3))
+        target, reason = self.policy.decide(current, depth["pending"], age, utilization, time.monotonic())
+        if target == current:
+            return
+        util = "n/a" if utilization is None else f"{utilization:.0%}"
+        logger.info(f"[AUTOSCALE] {current} -> {target} workers: {reason} "
+                    f"(pending={depth['pending']}, oldest={age:.1f}s, utilization={util})")
+        metrics.scale_event(current, target, reason)
+        for _ in range(target - current):
+            self._spawn()
+        if target < current:
+            self._retire(current - target)
+
+    def _wait(self, seconds: float):
+        """Sleep until the next sample, draining the status pipe so workers never block on it."""
+        deadline = time.monotonic() + seconds
+        while not self._stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            readable, _, _ = select.select([self._status_r], [], [], min(remaining, 0.5))
+            if readable:
+                self._read_status()
+
+    def shutdown(self):
+        """Drain every worker, waiting up to worker_drain_timeout for in-flight jobs."""
+        self._retire(len(self._active))
+        while self._retiring:
+            self._reap()
+            self._read_status()
+            time.sleep(0.1)
+        os.close(self._status_r)
+        os.close(self._status_w)
+        logger.info("[AUTOSCALE] stopped")
+
+    # ------------------------
+    # Worker processes
+    # ------------------------
+    def _spawn(self):
+        # spread home shards: reuse the lowest slot number not taken
+        taken = {c.slot for c in self._active.values()}
+        slot = next(i for i in range(len(taken) + 1) if i not in taken)
+        cmd = [sys.executable, os.path.join(config.BASE_DIR, "main.py"), "start-workers",
+               "--shard", str(slot), "--status-fd", str(self._status_w)] + self.worker_args
+        proc = subprocess.Popen(cmd, pass_fds=(self._status_w,))
+        self._active[proc.pid] = _Child(proc, slot)
+        logger.info(f"[AUTOSCALE] started worker pid={proc.pid} (shard slot {slot})")
+
+    def _retire(self, n: int):
+        # retire the least busy workers; unknown utilization counts as idle
+        victims = sorted(self._active.values(), key=lambda c: (c.busy or 0.0, -c.started))[:n]
+        deadline = time.monotonic() + self.drain_timeout
+        for child in victims:
+            del self._active[child.proc.pid]
+            child.retire_deadline = deadline
+            self._retiring[child.proc.pid] = child
+            if child.proc.poll() is None:
+                child.proc.terminate()   # Worker.stop(): finish the current job, then exit
+            logger.info(f"[AUTOSCALE] retiring worker pid={child.proc.pid}")
+
+    def _reap(self):
+        now = time.monotonic()
+        for pid, child in list(self._retiring.items()):
+            if child.proc.poll() is not None:
+                del self._retiring[pid]
+                logger.info(f"[AUTOSCALE] worker pid={pid} drained (exit {child.proc.returncode})")
+            elif now > child.retire_deadline:
+                logger.warning(f"[AUTOSCALE] worker pid={pid} still busy after "
+                               f"{self.drain_timeout:.0f}s, killing it")
+                child.proc.kill()
+                child.proc.wait()
+                self._requeue(child)
+                del self._retiring[pid]
+        for pid, child in list(self._active.items()):
+            if child.proc.poll() is not None:
+                # the policy brings the pool back up to min_workers on the next sample
+                logger.error(f"[AUTOSCALE] worker pid={pid} exited unexpectedly (exit {child.proc.returncode})")
+                self._requeue(child)
+                del self._active[pid]
+
+    def _requeue(self, child: _Child):
+        """Return the jobs a dead worker still held to pending."""
+        self._read_status()   # whatever it wrote before dying
+        if not child.holding:
+            return
+        n = requeue_jobs(child.holding)
+        if n:
+            logger.warning(f"[AUTOSCALE] put {n} job(s) held by worker pid={child.proc.pid} back to pending")
+        child.holding = []
+
+    def _read_status(self):
+        while True:
+            try:
+                chunk = os.read(self._status_r, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            self._status_buf += chunk
+        *lines, self._status_buf = self._status_buf.split(b"\n")
+        for line in lines:
+            try:
+                report = json.loads(line)
+            except ValueError:
+                continue
+            pid = report.get("pid")
+            child = self._active.get(pid) or self._retiring.get(pid)
+            if child is None:
+                continue
+            if "busy" in report:
+                child.busy = float(report["busy"])
+            if "holding" in report:
+                child.holding = list(report["holding"])
+            if "also_holding" in report:
+                child.holding.extend(report["also_holding"])
+
+
+def parse_range(spec: str) -> Tuple[int, int]:
+    """"2:8" -> (2, 8); a single number N means N:N."""
+    lo, _, hi = spec.partition(":")
+    try:
+        low = int(lo)
+        high = int(hi) if hi else low
+    except ValueError:
+        raise ValueError(f"Invalid autoscale range {spec!r}, expected MIN:MAX")
+    return low, high
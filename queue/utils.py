@@ -1,22 +1,22 @@
 # queue/utils.py
 import os
+import time
 import math
 import logging
-from datetime import datetime
-from .config import LOG_DIR, LOG_LEVEL, RETRY_BACKOFF_BASE
-
-# Ensure logs dir
-os.makedirs(LOG_DIR, exist_ok=True)
+from . import config
 
 def get_logger(name: str):
     logger = logging.getLogger(name)
     if logger.handlers:
         return logger
-    level = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
+    config.ensure_loaded()
+    # Ensure logs dir
+    os.makedirs(config.LOG_DIR, exist_ok=True)
+    level = getattr(logging, config.LOG_LEVEL.upper(), logging.INFO)
     logger.setLevel(level)
     fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s",
                             datefmt="%Y-%m-%d %H:%M:%S")
-    fh = logging.FileHandler(os.path.join(LOG_DIR, f"{name}.log"))
+    fh = logging.FileHandler(os.path.join(config.LOG_DIR, f"{name}.log"))
     fh.setFormatter(fmt)
     ch = logging.StreamHandler()
     ch.setFormatter(fmt)
@@ -24,8 +24,22 @@ def get_logger(name: str):
     logger.addHandler(ch)
     return logger
 
+class _LazyLogger:
+    """
+    Stand-in for get_logger(name): the handlers (and the log directory) are
+    only created on first use, after config has been resolved.
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._logger = None
+
+    def __getattr__(self, attr):
+        if self._logger is None:
+            self._logger = get_logger(self._name)
+        return getattr(self._logger, attr)
+
 # global logger instance
-logger = get_logger("queue")
+logger = _LazyLogger("queue")
 
 def exponential_backoff(attempt: int) -> float:
     """
@@ -33,10 +47,35 @@ def exponential_backoff(attempt: int) -> float:
     """
     # ensure attempt >=1 for meaningful backoff in caller
     a = max(1, attempt)
-    return math.pow(RETRY_BACKOFF_BASE, a)
+    config.ensure_loaded()
+    return math.pow(config.RETRY_BACKOFF_BASE, a)
+
+def now_us() -> int:
+    """Current time as integer microseconds since the epoch (how timestamps are stored)."""
+    return time.time_ns() // 1000
+
+# datetime is only needed to show or parse text, never on the job hot path
+def format_timestamp(us: int) -> str:
+    """Epoch microseconds -> ISO-8601 UTC text; for display only."""
+    from datetime import datetime, timedelta
+    return (datetime(1970, 1, 1) + timedelta(microseconds=us)).isoformat() + "Z"
+
+def parse_timestamp(ts) -> int:
+    """Stored value or ISO-8601 text (older exports) -> epoch microseconds."""
+    if not isinstance(ts, str):
+        return int(ts)
+    from datetime import datetime, timedelta, timezone
+    dt = datetime.fromisoformat(ts[:-1] if ts.endswith("Z") else ts)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - datetime(1970, 1, 1)) // timedelta(microseconds=1)
 
 def now_timestamp() -> str:
-    return datetime.utcnow().isoformat() + "Z"
+    return format_timestamp(now_us())
+
+def timestamp_age(us: int) -> float:
+    """Seconds elapsed since an epoch-microsecond timestamp."""
+    return (now_us() - us) / 1e6
 
 def truncate_output(output: str, limit: int = 300) -> str:
     if output is None:
@@ -1,33 +1,185 @@
 # queue/worker.py
 
+import os
+import json
 import time
+import signal
+import threading
 import traceback
+from typing import List, Optional
 
-from .db import fetch_next_pending_job, update_job, add_to_dlq
+from .db import (fetch_next_pending_job, fetch_pending_batch, fetch_payload, fetch_payloads,
+                 update_job, complete_job, complete_jobs, add_to_dlq, requeue_jobs, shard_count,
+                 reconcile_deps)
 from .job import Job, JOB_PENDING, JOB_PROCESSING, JOB_COMPLETED, JOB_FAILED, JOB_DEAD
+from .job import resolve_batch_handler, execute_batch
 from .utils import logger
 from .manager import QueueManager
-from .config import WORKER_POLL_INTERVAL
+from . import config
 
 
 class Worker:
-    def __init__(self, poll_interval: int = None):
-        self.poll_interval = poll_interval if poll_interval is not None else WORKER_POLL_INTERVAL
+    # how often utilization is reported on status_fd (see queue/supervisor.py)
+    STATUS_INTERVAL = 1.0
+    # job ids per "holding" line, keeping every line under PIPE_BUF
+    HOLDING_PER_LINE = 64
+
+    def __init__(self, poll_interval: int = None, batch_size: int = None, batch_wait_ms: int = None,
+                 shard: int = None, status_fd: Optional[int] = None):
+        config.ensure_loaded()
+        self.poll_interval = poll_interval if poll_interval is not None else config.WORKER_POLL_INTERVAL
+        self.batch_size = batch_size if batch_size is not None else config.BATCH_MAX_SIZE
+        self.batch_wait_ms = batch_wait_ms if batch_wait_ms is not None else config.BATCH_MAX_WAIT_MS
         self.manager = QueueManager()
-        logger.info("[WORKER] initialized")
+        # home shard is claimed from first; the others are stolen from when it is empty
+        shards = shard_count()
+        self.home = (shard if shard is not None else os.getpid()) % shards
+        if shards > 1:
+            reconcile_deps()   # finish cross-shard releases a crashed process left behind
+        self._stopping = False
+        self.status_fd = status_fd
+        if status_fd is not None:
+            os.set_blocking(status_fd, False)   # never stall a job on a slow supervisor
+        self._busy = 0.0
+        self._done = 0
+        self._window_start = time.monotonic()
+        logger.info(f"[WORKER] initialized (home shard {self.home}/{shards})")
+
+    def stop(self, *_):
+        """Finish the job (or batch) in hand, then leave start()."""
+        if not self._stopping:
+            logger.info("[WORKER] stopping after current job")
+        self._stopping = True
 
     def start(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
         logger.info("[WORKER] started")
-        while True:
-            row = fetch_next_pending_job()
-            if not row:
+        while not self._stopping:
+            t0 = time.monotonic()
+            n = self.run_once()
+            if n:
+                self._busy += time.monotonic() - t0
+                self._done += n
+            else:
                 time.sleep(0.1)
-                continue
+            self._report()
+        logger.info("[WORKER] stopped")
+
+    def _report(self):
+        """Write {"pid", "busy", "jobs"} for the last STATUS_INTERVAL to status_fd, one JSON line."""
+        elapsed = time.monotonic() - self._window_start
+        if self.status_fd is None or elapsed < self.STATUS_INTERVAL:
+            return
+        self._send({"pid": os.getpid(), "busy": round(min(1.0, self._busy / elapsed), 3), "jobs": self._done})
+        self._busy = 0.0
+        self._done = 0
+        self._window_start = time.monotonic()
+
+    def _hold(self, job_ids: List[str]):
+        """
+        Tell the supervisor which claimed jobs this process holds, so it can put
+        them back to pending if it has to kill us. Sent on claim and on finish.
+        """
+        if self.status_fd is None:
+            return
+        pid = os.getpid()
+        chunks = [job_ids[i:i + self.HOLDING_PER_LINE] for i in range(0, len(job_ids), self.HOLDING_PER_LINE)]
+        self._send({"pid": pid, "holding": chunks[0] if chunks else []})
+        for chunk in chunks[1:]:
+            self._send({"pid": pid, "also_holding": chunk})
+
+    def _send(self, report: dict):
+        line = json.dumps(report) + "\n"
+        try:
+            os.write(self.status_fd, line.encode("utf-8"))   # < PIPE_BUF, so never interleaved
+        except BlockingIOError:
+            pass   # pipe full: drop this line
+        except OSError:
+            self.status_fd = None   # supervisor went away
+
+    def run_once(self) -> int:
+        """Claim and process one job (or one batch). Returns how many jobs were processed."""
+        job = fetch_next_pending_job(self.home)
+        if not job:
+            return 0
+
+        logger.info(f"[WORKER] picked job {job.id}: {job.command}")
+        self._hold([job.id])
+        try:
+            if job.is_dynamic and self.batch_size > 1:
+                batch_func = resolve_batch_handler(job.command)
+                if batch_func is not None:
+                    batch = self._fill_batch(job)
+                    self._hold([j.id for j in batch])
+                    self._process_batch(batch, batch_func)
+                    return len(batch)
 
-            job = Job.from_dict(row)
-            logger.info(f"[WORKER] picked job {job.id}: {job.command}")
             self._process(job)
+            return 1
+        finally:
+            self._hold([])
+
+    # ------------------------
+    # Batching
+    # ------------------------
+    def _fill_batch(self, first: Job) -> List[Job]:
+        """Claim more pending jobs for the same handler, waiting up to batch_wait_ms."""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait_ms / 1000.0
+        while True:
+            batch.extend(fetch_pending_batch(first.command, self.batch_size - len(batch), self.home))
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                return batch
+            time.sleep(min(0.005, remaining))
+
+    def _process_batch(self, jobs: List[Job], batch_func):
+        logger.info(f"[WORKER] batch of {len(jobs)} for {jobs[0].command}")
+        try:
+            payloads = fetch_payloads([j.id for j in jobs if j.payload is None])
+        except Exception as e:
+            # nothing ran yet: hand the jobs back without charging an attempt
+            logger.error(f"[WORKER] batch: loading payloads failed: {e}")
+            self._requeue(jobs)
+            return
+        for job in jobs:
+            job.mark_processing()
+            if job.payload is None:
+                job.payload = payloads.get(job.id)
+
+        outcomes = execute_batch(jobs, batch_func)
 
+        done = []
+        retried = False
+        for job, outcome in zip(jobs, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"[WORKER] Job {job.id} FAILED: {outcome}")
+                retried = self._fail_or_requeue(job) or retried
+            else:
+                job.mark_completed()
+                done.append(job)
+
+        if done:
+            # one transaction for the whole batch, dependents included
+            try:
+                released = complete_jobs(done)
+            except Exception as e:
+                # rolled back: treat it like the single-job path does a failed complete_job
+                logger.error(f"[WORKER] batch: recording {len(done)} completed job(s) failed: {e}")
+                for job in done:
+                    retried = self._fail_or_requeue(job) or retried
+            else:
+                logger.info(f"[WORKER] batch: {len(done)}/{len(jobs)} succeeded"
+                            + (f", released {released} dependent job(s)" if released else ""))
+                self._release_blobs(done)
+        if retried:
+            time.sleep(0.1)  # same short retry delay as the single-job path
+
+    # ------------------------
+    # Single jobs
+    # ------------------------
     def _process(self, job: Job):
         # mark processing (in-memory) and persist
         job.mark_processing()
@@ -45,31 +197,67 @@ class Worker:
                 else:
                     raise ValueError("jobs.add requires two numeric args")
 
+            # claims skip the payload column; only python jobs need it
+            if job.is_dynamic and job.payload is None:
+                job.payload = fetch_payload(job.id)
+
             result = job.execute()
             logger.info(f"[WORKER] Job {job.id} SUCCESS -> {str(result)[:200]}")
             job.mark_completed()
-            update_job(job)
-            return
+            released = complete_job(job)   # also unblocks dependents
+            if released:
+                logger.info(f"[WORKER] Job {job.id} released {released} dependent job(s)")
 
         except Exception as e:
             logger.error(f"[WORKER] Job {job.id} FAILED: {e}\n{traceback.format_exc()}")
+            if self._fail(job):
+                time.sleep(0.1)  # very short for tests; replace by exponential_backoff(job.attempts) in prod
+            return
+
+        self._release_blobs([job])
+
+    def _fail_or_requeue(self, job: Job) -> bool:
+        """_fail() for batch items; if the database refuses that too, hand the job back as is."""
+        try:
+            return self._fail(job)
+        except Exception as e:
+            logger.error(f"[WORKER] Job {job.id}: recording the failure failed: {e}")
+            self._requeue([job])
+            return True
 
-            # single source of truth for attempts increment:
-            job.mark_failed()   # increments attempts by 1 and sets failed state
+    def _requeue(self, jobs: List[Job]):
+        """Put claimed jobs back to pending after a database error; never raise."""
+        try:
+            requeue_jobs([job.id for job in jobs])
+        except Exception as e:
+            logger.error(f"[WORKER] {len(jobs)} job(s) left in processing, re-queue failed: {e}")
 
-            # If still allowed retries, set back to pending for re-queue
-            if job.attempts <= job.max_retries:
-                job.state = JOB_PENDING
-                update_job(job)
+    def _release_blobs(self, jobs: List[Job]):
+        """Drop offloaded payloads of completed jobs; the job already succeeded, so never raise."""
+        refs = [job.payload_ref for job in jobs if job.payload_ref]
+        if not refs:
+            return
+        try:
+            from .blobstore import release_blobs
+            release_blobs(refs)
+        except Exception as e:
+            logger.warning(f"[WORKER] blob cleanup failed (main.py gc will retry): {e}")
 
-                delay = 0.1  # very short for tests; replace by exponential_backoff(job.attempts) in prod
-                logger.warning(f"[WORKER] RETRY {job.id} in {delay:.2f}s (attempt {job.attempts}/{job.max_retries})")
-                time.sleep(delay)
-                return
+    def _fail(self, job: Job) -> bool:
+        """Record a failed attempt. Returns True if the job was re-queued, False if it went to the DLQ."""
+        # single source of truth for attempts increment:
+        job.mark_failed()   # increments attempts by 1 and sets failed state
 
-            # Exceeded retries -> DLQ
-            logger.error(f"[WORKER] Job {job.id} moved to DLQ (max retries exceeded)")
-            job.mark_dead()
+        # If still allowed retries, set back to pending for re-queue
+        if job.attempts <= job.max_retries:
+            job.state = JOB_PENDING
             update_job(job)
-            add_to_dlq(job)
-            return
+            logger.warning(f"[WORKER] RETRY {job.id} (attempt {job.attempts}/{job.max_retries})")
+            return True
+
+        # Exceeded retries -> DLQ
+        logger.error(f"[WORKER] Job {job.id} moved to DLQ (max retries exceeded)")
+        job.mark_dead()
+        update_job(job)
+        add_to_dlq(job)
+        return False